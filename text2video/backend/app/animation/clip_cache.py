@@ -0,0 +1,215 @@
+from __future__ import annotations
+
+import hashlib
+import json
+import os
+import shutil
+import threading
+from dataclasses import fields, is_dataclass
+from pathlib import Path
+from typing import Any, Callable, Dict, Tuple
+
+# Bump whenever a renderer change alters the pixels of an unchanged input:
+# every clip rendered before the bump is then a miss.
+RENDERER_VERSION = 5
+
+
+def _canonical(obj: Any) -> Any:
+    """JSON-ready form of a render input: dataclasses become tagged dicts."""
+    if is_dataclass(obj) and not isinstance(obj, type):
+        return {"__type__": type(obj).__name__, **{f.name: _canonical(getattr(obj, f.name)) for f in fields(obj)}}
+    if isinstance(obj, dict):
+        return {str(k): _canonical(v) for k, v in obj.items()}
+    if isinstance(obj, (list, tuple)):
+        return [_canonical(v) for v in obj]
+    return obj
+
+
+def clip_key(kind: str, source: Any, **params: Any) -> str:
+    """
+    Content address of a rendered clip: sha256 over the canonical JSON of the
+    render input (a SceneSpec, AnimationPlan, ...), its render parameters
+    (seconds, fps, size, shot effects) and RENDERER_VERSION.
+    """
+    payload = {
+        "kind": kind,
+        "version": RENDERER_VERSION,
+        "source": _canonical(source),
+        "params": _canonical(params),
+    }
+    blob = json.dumps(payload, sort_keys=True, separators=(",", ":"), ensure_ascii=False)
+    return hashlib.sha256(blob.encode("utf-8")).hexdigest()
+
+
+def _link_or_copy(src: Path, dst: Path) -> None:
+    # Atomic replace through a temp name, so readers never see half a file.
+    tmp = dst.with_name(f".{dst.name}.{os.getpid()}.{threading.get_ident()}.tmp")
+    tmp.unlink(missing_ok=True)
+    try:
+        os.link(src, tmp)
+    except OSError:
+        # cross-device, or a filesystem without hardlinks
+        shutil.copyfile(src, tmp)
+    os.replace(tmp, dst)
+
+
+class ClipCache:
+    """
+    Content-addressed store of encoded clips, one `<key>.mp4` per entry, plus
+    an optional `<key>.json` of metadata about it (see put).
+
+    Hits are handed out as hardlinks (copies across filesystems), so they cost
+    a directory entry rather than a render. Duration-agnostic clips can
+    instead be kept as one growing master per key (see put_master).
+    An entry's mtime is its last use; when the store grows past `max_bytes`,
+    least recently used entries are evicted first. `hits` / `misses` count
+    lookups in this process.
+
+        path, hit = cache.render(clip_key("scene", spec, ...), out_mp4, build)
+    """
+
+    def __init__(self, root: str | Path, max_bytes: int):
+        self.root = Path(root)
+        self.root.mkdir(parents=True, exist_ok=True)
+        self.max_bytes = max(0, int(max_bytes))
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+
+    def path(self, key: str) -> Path:
+        return self.root / f"{key}.mp4"
+
+    def meta_path(self, key: str) -> Path:
+        return self.root / f"{key}.json"
+
+    def count(self, hit: bool) -> None:
+        with self._lock:
+            if hit:
+                self.hits += 1
+            else:
+                self.misses += 1
+
+    def place(self, entry: Path, dest: str) -> str:
+        os.utime(entry)  # mark as recently used
+        _link_or_copy(entry, Path(dest))
+        return dest
+
+    def get(self, key: str, dest: str) -> str | None:
+        """Place the entry for `key` at `dest` and return it, or None on a miss."""
+        try:
+            self.place(self.path(key), dest)
+        except FileNotFoundError:
+            # not cached, or evicted between the two calls
+            self.count(False)
+            return None
+        self.count(True)
+        return dest
+
+    def put(self, key: str, src: str, meta: Dict[str, Any] | None = None) -> Path:
+        """
+        Store `src` as the entry for `key`, with `meta` (JSON-ready) kept next
+        to it, so a hit can skip whatever produced it (probing, measuring).
+        """
+        entry = self.path(key)
+        if meta is not None:
+            tmp = self.meta_path(key).with_name(f".{key}.json.{os.getpid()}.{threading.get_ident()}.tmp")
+            tmp.write_text(json.dumps(meta, sort_keys=True), encoding="utf-8")
+            os.replace(tmp, self.meta_path(key))
+        _link_or_copy(Path(src), entry)
+        self.evict()
+        return entry
+
+    def meta(self, key: str) -> Dict[str, Any] | None:
+        """Metadata stored with the entry for `key`, or None."""
+        try:
+            return json.loads(self.meta_path(key).read_text(encoding="utf-8"))
+        except (FileNotFoundError, ValueError):
+            return None
+
+    def lookup(self, key: str, dest: str) -> Dict[str, Any] | None:
+        """
+        Place the entry for `key` at `dest` and return its metadata, or None
+        on a miss (an entry stored without metadata counts as one).
+        """
+        meta = self.meta(key)
+        if meta is None:
+            self.count(False)
+            return None
+        return meta if self.get(key, dest) is not None else None
+
+    def render(self, key: str, dest: str, build: Callable[[str], str]) -> Tuple[str, bool]:
+        """
+        Cached clip for `key` at `dest`, built with `build(dest)` on a miss.
+        Returns (path, hit).
+        """
+        if self.get(key, dest) is not None:
+            return dest, True
+        # `dest` may still be a hardlink to an entry from an earlier hit;
+        # ffmpeg would overwrite that entry in place.
+        Path(dest).unlink(missing_ok=True)
+        out = build(dest)
+        self.put(key, out)
+        return out, False
+
+    # Masters: one clip per key that serves every length up to its own,
+    # stored as `<key>.<milliseconds>ms.mp4`.
+    def _masters(self, key: str) -> list[Tuple[Path, float]]:
+        masters = []
+        for p in self.root.glob(f"{key}.*ms.mp4"):
+            try:
+                masters.append((p, int(p.name[len(key) + 1 : -len("ms.mp4")]) / 1000))
+            except ValueError:
+                continue
+        return masters
+
+    def master(self, key: str) -> Tuple[Path, float] | None:
+        """Longest stored master for `key` as (path, seconds), or None."""
+        return max(self._masters(key), key=lambda m: m[1], default=None)
+
+    def put_master(self, key: str, src: str, seconds: float) -> Path:
+        """Store `src` as the master for `key`; shorter masters are dropped."""
+        entry = self.root / f"{key}.{int(round(seconds * 1000))}ms.mp4"
+        _link_or_copy(Path(src), entry)
+        for p, length in self._masters(key):
+            if length < seconds:
+                p.unlink(missing_ok=True)
+        self.evict()
+        return entry
+
+    def _entries(self) -> list[Tuple[float, int, Path]]:
+        entries = []
+        for p in self.root.glob("*.mp4"):
+            try:
+                st = p.stat()
+            except FileNotFoundError:
+                continue
+            entries.append((st.st_mtime, st.st_size, p))
+        return entries
+
+    def evict(self) -> int:
+        """Drop least recently used entries until the store fits max_bytes."""
+        entries = sorted(self._entries())
+        total = sum(size for _, size, _ in entries)
+        removed = 0
+        for _, size, p in entries:
+            if total <= self.max_bytes:
+                break
+            p.unlink(missing_ok=True)
+            p.with_suffix(".json").unlink(missing_ok=True)
+            total -= size
+            removed += 1
+        return removed
+
+    def counts(self) -> Dict[str, int]:
+        """Lookups in this process so far (cheap, unlike stats)."""
+        return {"hits": self.hits, "misses": self.misses}
+
+    def stats(self) -> Dict[str, int]:
+        entries = self._entries()
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "entries": len(entries),
+            "bytes": sum(size for _, size, _ in entries),
+            "max_bytes": self.max_bytes,
+        }
@@ -0,0 +1,52 @@
+from __future__ import annotations
+
+import threading
+from typing import Tuple
+
+from PIL import Image
+
+from .sprites import Sprite, blit
+
+
+class Compositor:
+    """
+    One preallocated RGBA canvas reused across frames.
+
+    A frame starts by pasting a background into the canvas, layers are then
+    alpha-blended into their own region in place, and the frame is converted
+    to RGB exactly once by `output()`. Memory per frame stays constant no
+    matter how many layers a renderer draws.
+    """
+
+    def __init__(self, w: int, h: int):
+        self.size: Tuple[int, int] = (w, h)
+        self.canvas = Image.new("RGBA", (w, h), (0, 0, 0, 255))
+
+    def begin(self, background: Image.Image) -> Image.Image:
+        """Reset the canvas to `background` (RGB or RGBA, same size)."""
+        self.canvas.paste(background, (0, 0))
+        return self.canvas
+
+    def blit(self, sprite: Sprite, x: int, y: int, opacity: float = 1.0) -> Image.Image:
+        return blit(self.canvas, sprite, x, y, opacity)
+
+    def composite(self, layer: Image.Image, x: int, y: int, opacity: float = 1.0) -> Image.Image:
+        """Blend a local RGBA layer whose top-left lands at (x, y)."""
+        return blit(self.canvas, Sprite(layer), x, y, opacity)
+
+    def output(self, mode: str = "RGB") -> Image.Image:
+        return self.canvas.convert(mode) if mode != "RGBA" else self.canvas.copy()
+
+
+_local = threading.local()
+
+
+def thread_compositor(w: int, h: int) -> Compositor:
+    """The calling worker thread's compositor for a (w, h) frame."""
+    comps = getattr(_local, "compositors", None)
+    if comps is None:
+        comps = _local.compositors = {}
+    comp = comps.get((w, h))
+    if comp is None:
+        comp = comps[(w, h)] = Compositor(w, h)
+    return comp
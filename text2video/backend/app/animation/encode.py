@@ -1,44 +1,42 @@
 from __future__ import annotations
-import os
-import subprocess
-from pathlib import Path
-from typing import Callable
-from PIL import Image
-from .plan import AnimationPlan
-from .renderer import render_frame
+from dataclasses import replace
 
-def render_to_mp4(plan: AnimationPlan, out_mp4: str) -> str:
-    out_path = Path(out_mp4)
-    out_path.parent.mkdir(parents=True, exist_ok=True)
+from .pipeline import draft_settings, encode_frames
+from .plan import AnimationPlan
+from .profiles import EncodingProfile, get_profile
+from .renderer import PlanRenderer
 
-    tmp_dir = out_path.parent / f".frames_{out_path.stem}"
-    if tmp_dir.exists():
-        for p in tmp_dir.glob("*.png"):
-            p.unlink()
-    tmp_dir.mkdir(parents=True, exist_ok=True)
+def render_to_mp4(
+    plan: AnimationPlan,
+    out_mp4: str,
+    workers: int | None = None,
+    segment_seconds: float | None = None,
+    draft: bool = False,
+    profile: str | EncodingProfile | None = None,
+) -> str:
+    encoder_args = get_profile(profile).x264_args(plan.fps)
+    if draft:
+        # Plan layouts are in absolute pixels, so frames are still drawn at
+        # full size (they are cheap: mostly held frames) but at the draft
+        # rate, and the encoder scales them down before x264.
+        dw, dh, fps = draft_settings(plan.width, plan.height, plan.fps)
+        plan = replace(plan, fps=fps)
+        encoder_args = ("-vf", f"scale={dw}:{dh}") + get_profile("draft").x264_args(fps)
 
     total_frames = int(plan.seconds * plan.fps)
+    renderer = PlanRenderer(plan)
 
-    for i in range(total_frames):
-        t = i / plan.fps
-        img: Image.Image = render_frame(plan, t)
-        img.save(tmp_dir / f"frame_{i:06d}.png", "PNG")
-
-    # Encode via ffmpeg
-    cmd = [
-        "ffmpeg", "-y",
-        "-framerate", str(plan.fps),
-        "-i", str(tmp_dir / "frame_%06d.png"),
-        "-c:v", "libx264",
-        "-pix_fmt", "yuv420p",
-        "-movflags", "+faststart",
-        str(out_path),
-    ]
-    subprocess.run(cmd, check=True, capture_output=True, text=True)
+    def frame(i: int) -> bytes:
+        return renderer.render(i / plan.fps).tobytes()
 
-    # Cleanup frames
-    for p in tmp_dir.glob("*.png"):
-        p.unlink()
-    tmp_dir.rmdir()
+    def frame_key(i: int):
+        return renderer.timeline.frame_params(i)
 
-    return str(out_path)
+    # Frames render in parallel and are piped to ffmpeg as raw RGB
+    # (optionally as concurrently encoded segments joined by stream copy).
+    # Runs of identical frames, e.g. the settled tail, are rendered once.
+    return encode_frames(
+        frame, total_frames, out_mp4, plan.width, plan.height, plan.fps,
+        workers=workers, segment_seconds=segment_seconds, frame_key=frame_key,
+        encoder_args=encoder_args,
+    )
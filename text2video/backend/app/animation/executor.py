@@ -0,0 +1,65 @@
+from __future__ import annotations
+
+import collections
+import os
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Callable, Deque, Iterator, TypeVar
+
+T = TypeVar("T")
+
+
+def default_workers() -> int:
+    """RENDER_WORKERS env var, else one worker per core (capped at 16)."""
+    env = (os.getenv("RENDER_WORKERS") or "").strip()
+    if env:
+        try:
+            return max(1, int(env))
+        except ValueError:
+            pass
+    return max(1, min(16, os.cpu_count() or 1))
+
+
+def default_segment_seconds() -> float | None:
+    """RENDER_SEGMENT_SECONDS env var; unset/0 keeps shots as one encode."""
+    env = (os.getenv("RENDER_SEGMENT_SECONDS") or "").strip()
+    try:
+        return float(env) if env and float(env) > 0 else None
+    except ValueError:
+        return None
+
+
+def render_ordered(
+    render: Callable[[int], T],
+    total: int,
+    workers: int | None = None,
+    window: int | None = None,
+) -> Iterator[T]:
+    """
+    Render frames 0..total-1 on a thread pool and yield them in order.
+
+    Frame renderers are pure functions of their index, and Pillow releases the
+    GIL in blur/composite/convert, so frames render out of order across
+    workers. At most `window` frames (default 2x workers) are in flight or
+    waiting to be consumed, which bounds memory when the encoder is the
+    slower side.
+    """
+    workers = default_workers() if workers is None else max(1, int(workers))
+    if workers == 1:
+        for i in range(total):
+            yield render(i)
+        return
+
+    window = max(workers, int(window or 2 * workers))
+    pending: Deque[Future] = collections.deque()
+    with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="frame") as pool:
+        try:
+            next_idx = 0
+            while next_idx < total or pending:
+                while next_idx < total and len(pending) < window:
+                    pending.append(pool.submit(render, next_idx))
+                    next_idx += 1
+                # Re-raises the worker's exception for the failing frame.
+                yield pending.popleft().result()
+        finally:
+            for f in pending:
+                f.cancel()
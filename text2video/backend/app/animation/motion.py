@@ -0,0 +1,136 @@
+from __future__ import annotations
+
+from dataclasses import astuple, dataclass, replace
+from typing import Any, Dict, Hashable, Tuple
+
+import numpy as np
+from PIL import Image
+
+from .cache import LRUCache
+from .pipeline import hold_runs
+from .scene_encode import scene_loop_period
+from .scene_renderer_cartoon import render_scene_frame_cartoon, scene_motion_speed
+from .scene_spec import SceneSpec
+from .shot_fx import ShotFX
+
+# The cartoon renderer draws in absolute pixels, so a smaller render is a
+# different picture: probe frames are rendered at delivery size, and only
+# every SAMPLE_STRIDE-th row and column of their difference is compared.
+SAMPLE_STRIDE = 2
+SAMPLE_PAIRS = 6
+# Per-channel difference below which a pixel counts as unchanged
+CHANGE_THRESHOLD = 3
+
+_stats: LRUCache["MotionStats"] = LRUCache(maxsize=64)
+
+
+@dataclass(frozen=True)
+class MotionStats:
+    """
+    How much a shot moves, as seen by the encoder.
+
+    `changed_fraction` is the mean fraction of pixels that differ between two
+    consecutive delivered frames (camera move included); `peak_speed` the
+    fastest motion in px/s at delivery size; `static_ranges` the (start, end)
+    seconds in which the delivered picture does not change at all.
+    """
+
+    changed_fraction: float
+    peak_speed: float
+    static_ranges: Tuple[Tuple[float, float], ...] = ()
+
+    @property
+    def static_seconds(self) -> float:
+        return sum(b - a for a, b in self.static_ranges)
+
+    def as_dict(self) -> Dict[str, Any]:
+        return {
+            "changed_fraction": round(self.changed_fraction, 5),
+            "peak_speed": round(self.peak_speed, 2),
+            "static_ranges": [[round(a, 3), round(b, 3)] for a, b in self.static_ranges],
+        }
+
+
+def changed_fraction(a: Image.Image, b: Image.Image, stride: int = 1) -> float:
+    """
+    Fraction of pixels whose color differs by more than CHANGE_THRESHOLD,
+    over every `stride`-th row and column.
+    """
+    da = np.asarray(a.convert("RGB"), dtype=np.int16)[::stride, ::stride]
+    db = np.asarray(b.convert("RGB"), dtype=np.int16)[::stride, ::stride]
+    return float((np.abs(da - db).max(axis=2) > CHANGE_THRESHOLD).mean())
+
+
+def static_ranges(
+    seconds: float, fps: int, fx: ShotFX | None = None, scene_static: bool = False
+) -> Tuple[Tuple[float, float], ...]:
+    """
+    (start, end) seconds of the runs of identical delivered frames in a shot
+    (pipeline.hold_runs): a frame is its scene frame (constant if
+    `scene_static`), its camera window and its caption's slide and opacity.
+    """
+    camera = fx.camera if fx is not None else None
+    caption = fx.caption if fx is not None else None
+
+    def frame_key(i: int) -> Hashable:
+        t = i / fps
+        return (
+            None if scene_static else i,
+            camera.box(t, 1, 1) if camera is not None else None,
+            (caption.offset(t), caption.opacity(t)) if caption is not None else None,
+        )
+
+    runs = hold_runs(0, int(seconds * fps), frame_key)
+    return tuple((first / fps, (first + count) / fps) for first, count in runs if count > 1)
+
+
+def _measure_scene(spec: SceneSpec, seconds: float, fps: int, w: int, h: int, fx: ShotFX | None) -> MotionStats:
+    # Measure the scene as it is rendered: looping scenes in loop mode.
+    period = scene_loop_period(spec, fps)
+    if period is not None:
+        spec = replace(spec, loop_seconds=period)
+    step = 1.0 / fps
+    fractions = []
+    scene_static = True
+    for k in range(SAMPLE_PAIRS):
+        t = max(0.0, seconds - step) * (k + 0.5) / SAMPLE_PAIRS
+        a = render_scene_frame_cartoon(spec, t, w, h, seconds=seconds)
+        b = render_scene_frame_cartoon(spec, t + step, w, h, seconds=seconds)
+        scene_static = scene_static and a.tobytes() == b.tobytes()
+        if fx is not None:
+            a, b = fx.apply(a, t), fx.apply(b, t + step)
+        fractions.append(changed_fraction(a, b, SAMPLE_STRIDE))
+
+    scene_speed = scene_motion_speed(spec, w, h, seconds)
+    # sunrise skies brighten every frame without moving anything
+    scene_static = scene_static and scene_speed == 0 and spec.theme != "sunrise"
+    speed = max(scene_speed, fx.motion_speed(w, h)) if fx is not None else scene_speed
+    return MotionStats(
+        changed_fraction=float(np.mean(fractions)),
+        peak_speed=speed,
+        static_ranges=static_ranges(seconds, fps, fx, scene_static),
+    )
+
+
+def scene_motion(
+    spec: SceneSpec,
+    seconds: float,
+    fps: int = 30,
+    w: int = 1280,
+    h: int = 720,
+    fx: ShotFX | None = None,
+) -> MotionStats:
+    """
+    Motion metadata for a scene shot: changed pixels are measured on a few
+    consecutive delivered frame pairs (scene and shot effects at delivery
+    size), speeds come from the renderer's own motion model, static ranges
+    from the shot's frame timeline (see static_ranges). Memoized per (spec,
+    duration, rate, size, effects; the caption's text does not matter).
+    """
+    caption = fx.caption if fx is not None else None
+    key = (
+        astuple(spec), float(seconds), fps, w, h,
+        fx.camera if fx is not None else None,
+        replace(caption, title="", sub="") if caption is not None else None,
+    )
+    return _stats.get_or_create(key, lambda: _measure_scene(spec, float(seconds), fps, w, h, fx))
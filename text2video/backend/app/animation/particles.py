@@ -0,0 +1,149 @@
+from __future__ import annotations
+
+from dataclasses import dataclass
+from typing import List, Sequence, Tuple
+
+import numpy as np
+from PIL import Image, ImageDraw, ImageFilter
+
+RGB = Tuple[int, int, int]
+
+
+@dataclass(frozen=True)
+class Stamp:
+    """
+    Pre-blurred alpha footprint of one particle, as flat pixel lists.
+    (dx, dy) are offsets from the particle's position, `a` the alpha there.
+    """
+
+    dx: np.ndarray
+    dy: np.ndarray
+    a: np.ndarray
+    # how far the footprint reaches outside the particle's position
+    reach: int
+
+    @classmethod
+    def from_layer(cls, layer: Image.Image, ox: int, oy: int) -> "Stamp":
+        alpha = np.asarray(layer.getchannel("A"))
+        ys, xs = np.nonzero(alpha)
+        reach = max(abs(ox), abs(oy), layer.width + ox, layer.height + oy)
+        return cls(
+            dx=(xs + ox).astype(np.int32),
+            dy=(ys + oy).astype(np.int32),
+            a=alpha[ys, xs].astype(np.uint8),
+            reach=int(reach),
+        )
+
+
+def rain_stamp() -> Stamp:
+    # a 2px streak slanting down-left, softened like the old full-frame blur
+    pad = 4
+    layer = Image.new("RGBA", (10 + 2 * pad + 1, 22 + 2 * pad + 1), (0, 0, 0, 0))
+    ImageDraw.Draw(layer).line([pad + 10, pad, pad, pad + 22], fill=(255, 255, 255, 120), width=2)
+    return Stamp.from_layer(layer.filter(ImageFilter.GaussianBlur(1)), -10 - pad, -pad)
+
+
+def snow_stamp(r: int) -> Stamp:
+    pad = 2
+    size = 2 * (r + pad) + 1
+    layer = Image.new("RGBA", (size, size), (0, 0, 0, 0))
+    c = r + pad
+    ImageDraw.Draw(layer).ellipse([c - r, c - r, c + r, c + r], fill=(255, 255, 255, 170))
+    return Stamp.from_layer(layer.filter(ImageFilter.GaussianBlur(0.5)), -c, -c)
+
+
+class ParticleField:
+    """
+    Array-backed particle system for one shot.
+
+    Start positions, velocities, sway and stamp variant are drawn once from a
+    seeded generator. A particle's position at t is closed-form,
+    p0 + v * t (+ horizontal sway) wrapped around the frame, so frames can be
+    rendered in any order. Rasterizing is one scatter of all stamp pixels into
+    an alpha buffer, so the cost grows with the number of stamp pixels rather
+    than with Python-level draw calls. Thousands of particles stay cheap.
+    With `period`, speeds and sway are rounded so the field repeats exactly
+    every `period` seconds (seamless loops).
+    """
+
+    def __init__(
+        self,
+        count: int,
+        w: int,
+        h: int,
+        velocity: Tuple[float, float],
+        stamps: Sequence[Stamp],
+        color: RGB,
+        seed: int = 0,
+        speed_jitter: float = 0.1,
+        sway: float = 0.0,
+        period: float | None = None,
+    ):
+        rng = np.random.default_rng(seed)
+        self.size = (w, h)
+        self.color = tuple(color)
+        self.stamps: List[Stamp] = list(stamps)
+        # Particles wrap over a frame grown by the stamp reach, so they
+        # drift in and out of view instead of popping at the edges.
+        self.margin = max((s.reach for s in self.stamps), default=0)
+        self.span = (w + 2 * self.margin, h + 2 * self.margin)
+
+        n = max(0, int(count))
+        self.x0 = rng.uniform(0, self.span[0], n)
+        self.y0 = rng.uniform(0, self.span[1], n)
+        speed = 1.0 + rng.uniform(-speed_jitter, speed_jitter, n)
+        self.vx = velocity[0] * speed
+        self.vy = velocity[1] * speed
+        self.sway_amp = sway * rng.uniform(0.5, 1.0, n)
+        self.sway_freq = rng.uniform(0.6, 1.4, n)
+        self.sway_phase = rng.uniform(0, 2 * np.pi, n)
+        self.variant = rng.integers(0, max(1, len(self.stamps)), n)
+        if period:
+            self._make_periodic(float(period))
+
+    def _make_periodic(self, period: float) -> None:
+        # Round every particle's motion to whole wraps / sway cycles per
+        # period, so the field at t + period is exactly the field at t.
+        wraps_x = np.round(self.vx * period / self.span[0])
+        wraps_y = np.maximum(1, np.round(self.vy * period / self.span[1]))
+        self.vx = wraps_x * self.span[0] / period
+        self.vy = wraps_y * self.span[1] / period
+        cycles = np.maximum(1, np.round(self.sway_freq * period / (2 * np.pi)))
+        self.sway_freq = cycles * 2 * np.pi / period
+
+    def __len__(self) -> int:
+        return len(self.x0)
+
+    def positions(self, t: float) -> Tuple[np.ndarray, np.ndarray]:
+        x = self.x0 + self.vx * t + self.sway_amp * np.sin(self.sway_freq * t + self.sway_phase)
+        y = self.y0 + self.vy * t
+        x = np.floor(np.mod(x, self.span[0])).astype(np.int32) - self.margin
+        y = np.floor(np.mod(y, self.span[1])).astype(np.int32) - self.margin
+        return x, y
+
+    def alpha(self, t: float) -> np.ndarray:
+        """HxW uint8 coverage of all particles at t (overlaps keep the max)."""
+        w, h = self.size
+        buf = np.zeros((h, w), dtype=np.uint8)
+        x, y = self.positions(t)
+        for k, stamp in enumerate(self.stamps):
+            sel = self.variant == k
+            if not sel.any():
+                continue
+            xs = (x[sel, None] + stamp.dx[None, :]).ravel()
+            ys = (y[sel, None] + stamp.dy[None, :]).ravel()
+            a = np.broadcast_to(stamp.a, (int(sel.sum()), len(stamp.a))).ravel()
+            inside = (xs >= 0) & (xs < w) & (ys >= 0) & (ys < h)
+            np.maximum.at(buf, (ys[inside], xs[inside]), a[inside])
+        return buf
+
+    def draw(self, canvas: Image.Image, t: float) -> Image.Image:
+        """Blend the particles (one flat color, per-pixel alpha) into `canvas` in place."""
+        if not len(self):
+            return canvas
+        mask = Image.fromarray(self.alpha(t), "L")
+        bbox = mask.getbbox()
+        if bbox:
+            fill = self.color + (255,) if canvas.mode == "RGBA" else self.color
+            canvas.paste(fill, bbox, mask.crop(bbox))
+        return canvas
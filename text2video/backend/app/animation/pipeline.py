@@ -0,0 +1,224 @@
+from __future__ import annotations
+
+import subprocess
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Callable, Hashable, List, Sequence, Tuple
+
+from .executor import default_segment_seconds, default_workers, render_ordered
+from .profiles import get_profile
+from .sink import FFmpegSink, keyframe_args, retime_args
+
+# A frame source: frame index -> raw RGB bytes (w * h * 3)
+FrameFn = Callable[[int], bytes]
+# Optional frame signature: equal keys for two indices => identical frames
+FrameKeyFn = Callable[[int], Hashable]
+
+# Draft previews render at half size and at most 15 fps.
+DRAFT_SCALE = 0.5
+DRAFT_FPS = 15
+
+
+def draft_settings(w: int, h: int, fps: int) -> Tuple[int, int, int]:
+    """(w, h, fps) a draft preview of a w x h @ fps render uses (even sizes for yuv420p)."""
+    dw = max(2, int(w * DRAFT_SCALE) // 2 * 2)
+    dh = max(2, int(h * DRAFT_SCALE) // 2 * 2)
+    return dw, dh, min(fps, DRAFT_FPS)
+
+
+def hold_runs(start: int, end: int, frame_key: FrameKeyFn | None) -> List[Tuple[int, int]]:
+    """
+    Split [start, end) into (first_index, count) runs of identical frames.
+    Without a key function every frame is its own run.
+    """
+    if frame_key is None:
+        return [(i, 1) for i in range(start, end)]
+    runs: List[Tuple[int, int]] = []
+    prev = object()
+    for i in range(start, end):
+        key = frame_key(i)
+        if runs and key == prev:
+            first, count = runs[-1]
+            runs[-1] = (first, count + 1)
+        else:
+            runs.append((i, 1))
+        prev = key
+    return runs
+
+
+def _encode_range(
+    frame: FrameFn,
+    start: int,
+    end: int,
+    out_mp4: str,
+    w: int,
+    h: int,
+    fps: int,
+    workers: int,
+    frame_key: FrameKeyFn | None = None,
+    output_fps: int | None = None,
+    retime: str = "blend",
+    keyframe_seconds: float | None = None,
+    encoder_args: Sequence[str] | None = None,
+) -> str:
+    # Held frames are rendered once and handed to the encoder `count` times;
+    # x264 turns the repeats into near-free skip frames.
+    runs = hold_runs(start, end, frame_key)
+    if encoder_args is None:
+        encoder_args = get_profile().x264_args(output_fps or fps)
+    output_args = retime_args(fps, output_fps, retime) + keyframe_args(keyframe_seconds) + tuple(encoder_args)
+    with FFmpegSink(out_mp4, w, h, fps, output_args=output_args) as sink:
+        rendered = render_ordered(lambda k: frame(runs[k][0]), len(runs), workers=workers)
+        for (_, count), data in zip(runs, rendered):
+            for _ in range(count):
+                sink.write(data)
+    return out_mp4
+
+
+def _concat_copy(parts: List[str], out_mp4: str) -> None:
+    out_path = Path(out_mp4)
+    list_file = out_path.parent / f".{out_path.stem}.segments.txt"
+    with open(list_file, "w", encoding="utf-8") as f:
+        for p in parts:
+            safe = str(Path(p).resolve()).replace("\\", "/")
+            f.write(f"file '{safe}'\n")
+    try:
+        cmd = [
+            "ffmpeg", "-y",
+            "-f", "concat", "-safe", "0",
+            "-i", str(list_file),
+            "-c", "copy",
+            "-movflags", "+faststart",
+            str(out_path),
+        ]
+        subprocess.run(cmd, check=True, capture_output=True, text=True)
+    finally:
+        list_file.unlink(missing_ok=True)
+
+
+def loop_copy(src_mp4: str, out_mp4: str, seconds: float) -> str:
+    """
+    Repeat `src_mp4` back to back up to `seconds`, in stream-copy mode.
+    The source starts on an IDR frame, so every repetition decodes on its own
+    and no frame is re-encoded.
+    """
+    out_path = Path(out_mp4)
+    out_path.parent.mkdir(parents=True, exist_ok=True)
+    cmd = [
+        "ffmpeg", "-y",
+        "-stream_loop", "-1",
+        "-i", str(src_mp4),
+        "-t", f"{seconds:.3f}",
+        "-c", "copy",
+        "-movflags", "+faststart",
+        str(out_path),
+    ]
+    subprocess.run(cmd, check=True, capture_output=True, text=True)
+    return str(out_path)
+
+
+def trim_copy(src_mp4: str, out_mp4: str, seconds: float) -> str:
+    """
+    First `seconds` of `src_mp4`, in stream-copy mode. Clean when the cut
+    lands on a keyframe (see keyframe_args), since a GOP is never split.
+    """
+    out_path = Path(out_mp4)
+    out_path.parent.mkdir(parents=True, exist_ok=True)
+    cmd = [
+        "ffmpeg", "-y",
+        "-i", str(src_mp4),
+        "-t", f"{seconds:.3f}",
+        "-c", "copy",
+        "-movflags", "+faststart",
+        str(out_path),
+    ]
+    subprocess.run(cmd, check=True, capture_output=True, text=True)
+    return str(out_path)
+
+
+def concat_copy(parts: List[str], out_mp4: str) -> str:
+    """Join clips with identical encoder settings back to back, in stream-copy mode."""
+    Path(out_mp4).parent.mkdir(parents=True, exist_ok=True)
+    _concat_copy(parts, out_mp4)
+    return str(out_mp4)
+
+
+def segment_ranges(total_frames: int, segment_frames: int) -> List[Tuple[int, int]]:
+    segment_frames = max(1, segment_frames)
+    return [(s, min(total_frames, s + segment_frames)) for s in range(0, total_frames, segment_frames)]
+
+
+def encode_frames(
+    frame: FrameFn,
+    total_frames: int,
+    out_mp4: str,
+    w: int,
+    h: int,
+    fps: int,
+    workers: int | None = None,
+    segment_seconds: float | None = None,
+    frame_key: FrameKeyFn | None = None,
+    output_fps: int | None = None,
+    retime: str = "blend",
+    keyframe_seconds: float | None = None,
+    encoder_args: Sequence[str] | None = None,
+) -> str:
+    """
+    Render `total_frames` frames and encode them to `out_mp4`.
+
+    Default: one ffmpeg stream fed by the parallel frame executor. With
+    `frame_key`, runs of frames with equal keys (static tails, holds) are
+    rendered once and duplicated on the encoder side.
+    With `segment_seconds` (default: RENDER_SEGMENT_SECONDS env), the shot is
+    cut into fixed-length segments at frame boundaries; each segment is its
+    own encode (so it starts on an IDR frame), segments render+encode
+    concurrently, and they are joined with the concat demuxer in stream-copy
+    mode. All segments share the same encoder settings, so the joined file is
+    a regular single-track MP4.
+    With `output_fps`, frames are rendered at `fps` and the encoder brings
+    them up to `output_fps` by blending or duplicating (`retime`).
+    With `keyframe_seconds`, a keyframe is forced every that many seconds
+    so the clip can later be cut there in stream-copy mode.
+    `encoder_args` replaces the default profile's x264 settings (see
+    profiles.EncodingProfile.x264_args).
+    """
+    out_path = Path(out_mp4)
+    out_path.parent.mkdir(parents=True, exist_ok=True)
+    workers = default_workers() if workers is None else max(1, int(workers))
+    if segment_seconds is None:
+        segment_seconds = default_segment_seconds()
+
+    segment_frames = int(round((segment_seconds or 0) * fps))
+    if segment_frames <= 0 or total_frames <= segment_frames:
+        return _encode_range(
+            frame, 0, total_frames, str(out_path), w, h, fps, workers,
+            frame_key, output_fps, retime, keyframe_seconds, encoder_args,
+        )
+
+    ranges = segment_ranges(total_frames, segment_frames)
+    jobs = max(1, min(len(ranges), workers))
+    per_job = max(1, workers // jobs)
+    parts = [str(out_path.parent / f".seg_{out_path.stem}_{k:03d}.mp4") for k in range(len(ranges))]
+
+    try:
+        with ThreadPoolExecutor(max_workers=jobs, thread_name_prefix="segment") as pool:
+            futures = [
+                pool.submit(
+                    _encode_range, frame, s, e, part, w, h, fps, per_job,
+                    frame_key, output_fps, retime, keyframe_seconds, encoder_args,
+                )
+                for (s, e), part in zip(ranges, parts)
+            ]
+            for f in futures:
+                try:
+                    f.result()
+                except BaseException:
+                    for other in futures:
+                        other.cancel()
+                    raise
+        _concat_copy(parts, str(out_path))
+    finally:
+        for p in parts:
+            Path(p).unlink(missing_ok=True)
+
+    return str(out_path)
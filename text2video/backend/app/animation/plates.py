@@ -0,0 +1,135 @@
+from __future__ import annotations
+
+import math
+from typing import Literal, Tuple
+
+import numpy as np
+from PIL import Image, ImageDraw, ImageFilter
+
+from .cache import LRUCache
+
+RGB = Tuple[int, int, int]
+Vignette = Literal["rings", "soft", "none"]
+
+# Plates are ~2.7 MB each at 1280x720; a worker rarely needs more than a few
+# palettes at once (one per theme, two for the sunrise lerp endpoints).
+_plates: LRUCache[np.ndarray] = LRUCache(maxsize=24)
+_masks: LRUCache[np.ndarray] = LRUCache(maxsize=8)
+_plate_images: LRUCache[Image.Image] = LRUCache(maxsize=24)
+
+
+# -----------------------------
+# Vignette masks (palette independent)
+# -----------------------------
+def _rings_mask(w: int, h: int, strength: float) -> np.ndarray:
+    # Same ring construction the motion-graphics renderer always used,
+    # just computed once per (size, strength) instead of per frame.
+    mask = Image.new("L", (w, h), 0)
+    d = ImageDraw.Draw(mask)
+    max_r = int(math.hypot(w, h) * 0.55)
+    steps = 40
+    for i in range(steps):
+        t = i / (steps - 1)
+        alpha = int(255 * (t ** 2) * strength)
+        r = int(max_r + (0 - max_r) * t)
+        bbox = [w // 2 - r, h // 2 - r, w // 2 + r, h // 2 + r]
+        d.ellipse(bbox, outline=alpha, width=max(1, int(max_r / steps)))
+    mask = mask.filter(ImageFilter.GaussianBlur(40))
+    v = np.asarray(mask, dtype=np.float32) / 255.0
+    # composite(black, img, v) then blend 0.35 with the original
+    return 1.0 - 0.35 * v
+
+
+def _soft_mask(w: int, h: int, strength: float) -> np.ndarray:
+    mask = Image.new("L", (w, h), 0)
+    d = ImageDraw.Draw(mask)
+    r = int(math.hypot(w, h) * 0.55)
+    d.ellipse([w // 2 - r, h // 2 - r, w // 2 + r, h // 2 + r], fill=255)
+    mask = mask.filter(ImageFilter.GaussianBlur(80))
+    m = np.asarray(mask, dtype=np.float32) / 255.0
+    # composite(img, black, m) then blend `strength` with the original
+    return 1.0 - strength * (1.0 - m)
+
+
+def vignette_factor(w: int, h: int, kind: Vignette, strength: float) -> np.ndarray | None:
+    """Per-pixel brightness multiplier (HxW float32) for a vignette, cached."""
+    if kind == "none" or strength <= 0:
+        return None
+    key = (w, h, kind, round(float(strength), 4))
+    if kind == "rings":
+        return _masks.get_or_create(key, lambda: _rings_mask(w, h, strength))
+    return _masks.get_or_create(key, lambda: _soft_mask(w, h, strength))
+
+
+# -----------------------------
+# Plates
+# -----------------------------
+def _build_plate(w: int, h: int, top: RGB, bottom: RGB, kind: Vignette, strength: float) -> np.ndarray:
+    t = np.linspace(0.0, 1.0, h, dtype=np.float32) if h > 1 else np.zeros(1, np.float32)
+    top_a = np.asarray(top, dtype=np.float32)
+    bottom_a = np.asarray(bottom, dtype=np.float32)
+    rows = np.floor(top_a + (bottom_a - top_a) * t[:, None])  # (h, 3)
+    plate = np.broadcast_to(rows[:, None, :], (h, w, 3))
+
+    factor = vignette_factor(w, h, kind, strength)
+    if factor is not None:
+        plate = plate * factor[:, :, None]
+
+    out = np.clip(plate, 0, 255).astype(np.uint8)
+    out.flags.writeable = False
+    return out
+
+
+def gradient_plate(
+    w: int,
+    h: int,
+    top: RGB,
+    bottom: RGB,
+    vignette: Vignette = "none",
+    strength: float = 0.0,
+) -> np.ndarray:
+    """
+    Vertical gradient + vignette as a read-only (h, w, 3) uint8 array.
+    Cached by (size, palette, vignette, strength) in a bounded LRU.
+    """
+    key = (w, h, tuple(top), tuple(bottom), vignette, round(float(strength), 4))
+    return _plates.get_or_create(key, lambda: _build_plate(w, h, top, bottom, vignette, strength))
+
+
+def gradient_plate_image(
+    w: int,
+    h: int,
+    top: RGB,
+    bottom: RGB,
+    vignette: Vignette = "none",
+    strength: float = 0.0,
+) -> Image.Image:
+    """
+    Shared, cached RGBA image of `gradient_plate`, ready to be pasted into a
+    compositor canvas without a mode conversion. Never draw on it; use
+    `plate_image` for a private copy.
+    """
+    key = (w, h, tuple(top), tuple(bottom), vignette, round(float(strength), 4))
+    return _plate_images.get_or_create(
+        key, lambda: plate_image(gradient_plate(w, h, top, bottom, vignette, strength), "RGBA")
+    )
+
+
+def blend_plates(a: np.ndarray, b: np.ndarray, t: float) -> np.ndarray:
+    """Vectorized a->b lerp, used for time-varying palettes (e.g. sunrise)."""
+    t = 0.0 if t < 0 else 1.0 if t > 1 else float(t)
+    if t == 0.0:
+        return a
+    if t == 1.0:
+        return b
+    out = a.astype(np.float32)
+    out += (b.astype(np.float32) - out) * t
+    return out.astype(np.uint8)
+
+
+def plate_image(plate: np.ndarray, mode: str = "RGB") -> Image.Image:
+    """Fresh image from a cached plate (safe for callers to draw on)."""
+    if mode == "RGBA":
+        alpha = np.full(plate.shape[:2] + (1,), 255, dtype=np.uint8)
+        return Image.fromarray(np.concatenate([plate, alpha], axis=2))
+    return Image.fromarray(plate)
@@ -0,0 +1,204 @@
+from __future__ import annotations
+
+from dataclasses import dataclass, replace
+from typing import TYPE_CHECKING, Dict, Tuple
+
+if TYPE_CHECKING:
+    from .motion import MotionStats
+
+
+@dataclass(frozen=True)
+class DeliveryFormat:
+    """
+    Output contract every shot asset meets, so a project's shots can be
+    joined with the concat demuxer in stream-copy mode. Encoder settings
+    that vary per shot (CRF, tune, GOP length) stay out of it: x264 writes
+    "stitchable" headers and repeats them in-band at every keyframe, and
+    each clip opens on an IDR frame.
+    """
+
+    width: int = 1280
+    height: int = 720
+    fps: int = 30
+    pix_fmt: str = "yuv420p"
+    codec: str = "h264"
+    # mp4 track timescale (ticks per second); 15360 = 512 per frame at 30 fps
+    timescale: int = 15360
+    # H.264 profile and level: SPS fields a decoder may not renegotiate
+    # mid-stream. The draft tier (ultrafast: no CABAC, no 8x8 transform)
+    # writes Constrained Baseline and cannot meet this.
+    profile: str = "High"
+    level: str = "4.0"
+
+    @property
+    def time_base(self) -> str:
+        return f"1/{self.timescale}"
+
+    @property
+    def frame_rate(self) -> str:
+        return f"{self.fps}/1"
+
+
+DELIVERY = DeliveryFormat()
+
+
+@dataclass(frozen=True)
+class EncodingProfile:
+    """
+    x264 settings for one quality tier. Every encoder in the app (frame
+    sinks, the ffmpeg animation pass, the test pattern) builds its output
+    args from a profile, so a tier trades quality for speed everywhere.
+    """
+
+    name: str
+    preset: str
+    crf: int
+    # default content tune; callers that know better (photoreal WAN2 clips,
+    # the static test pattern) pass their own to x264_args()
+    tune: str | None = None
+    # max distance between keyframes (None: x264 default of 250 frames)
+    keyint_seconds: float | None = None
+    # encoder threads (None: x264 picks from the core count)
+    threads: int | None = None
+
+    def x264_args(self, fps: float | None = None, tune: str | None = None) -> Tuple[str, ...]:
+        """ffmpeg output args for this profile (`fps` is the output rate, for keyint)."""
+        args = ["-c:v", "libx264", "-preset", self.preset, "-crf", str(self.crf)]
+        tune = tune or self.tune
+        if tune:
+            args += ["-tune", tune]
+        if self.keyint_seconds and fps:
+            args += ["-g", str(max(1, int(round(self.keyint_seconds * fps))))]
+        if self.threads:
+            args += ["-threads", str(self.threads)]
+        # concat-safe output (see DeliveryFormat)
+        args += [
+            "-level", DELIVERY.level,
+            "-x264-params", "stitchable=1:repeat-headers=1",
+            "-pix_fmt", DELIVERY.pix_fmt,
+            "-video_track_timescale", str(DELIVERY.timescale),
+            "-movflags", "+faststart",
+        ]
+        return tuple(args)
+
+
+PROFILES: Dict[str, EncodingProfile] = {
+    # previews: as fast as x264 goes, quality only has to be good enough to judge a cut
+    "draft": EncodingProfile("draft", preset="ultrafast", crf=30),
+    # delivery default: flat cartoon frames compress well with tune=animation
+    "standard": EncodingProfile("standard", preset="veryfast", crf=23, tune="animation", keyint_seconds=2.0),
+    # masters: slow preset, near-transparent quality
+    "archival": EncodingProfile("archival", preset="slow", crf=18, tune="animation", keyint_seconds=4.0),
+}
+
+DEFAULT_PROFILE = "standard"
+
+
+def default_profile_name() -> str:
+    """
+    The server's tier (settings.encoding_profile), or DEFAULT_PROFILE when
+    this package is used without the app's settings.
+    """
+    try:
+        from ..config import settings
+    except ImportError:
+        return DEFAULT_PROFILE
+    return settings.encoding_profile or DEFAULT_PROFILE
+
+
+def get_profile(profile: str | EncodingProfile | None = None) -> EncodingProfile:
+    """Profile by name (case-insensitive); None means the server's tier (default_profile_name)."""
+    if isinstance(profile, EncodingProfile):
+        return profile
+    name = (profile or default_profile_name()).strip().lower()
+    if name not in PROFILES:
+        raise ValueError(f"Unknown encoding profile: {profile} (expected one of {', '.join(PROFILES)})")
+    return PROFILES[name]
+
+
+def delivery_profile(profile: str | EncodingProfile | None = None) -> EncodingProfile:
+    """
+    get_profile() for final shots: the draft tier is previews only, since its
+    output breaks the delivery contract (see DeliveryFormat.profile).
+    """
+    resolved = get_profile(profile)
+    if resolved.name == "draft":
+        raise ValueError("The draft profile is for previews only; final shots need one of "
+                         + ", ".join(name for name in PROFILES if name != "draft"))
+    return resolved
+
+
+# -----------------------------
+# Per-shot adaptation
+# -----------------------------
+@dataclass(frozen=True)
+class ShotBudget:
+    """How much quality / render time a shot type is worth."""
+
+    # added to the profile's CRF (negative: better quality)
+    crf_offset: int = 0
+    # largest motion between two rendered frames for temporal subsampling
+    # when the shot's plan has no "render_fps" (None: render every delivered
+    # frame; subsampling stays opt-in with "render_fps": "auto")
+    max_step_px: float | None = None
+    # multiplies the profile's keyframe interval
+    keyint_scale: float = 1.0
+
+
+SHOT_BUDGETS: Dict[str, ShotBudget] = {
+    "HERO": ShotBudget(crf_offset=-2),
+    "STANDARD": ShotBudget(),
+    # transitions / reaction shots: nobody looks closely
+    "BRIDGE": ShotBudget(crf_offset=3, max_step_px=4.0, keyint_scale=2.0),
+}
+
+# Below this changed-pixel fraction a shot is encoded like a slide
+STILL_FRACTION = 0.005
+STILL_KEYINT_SECONDS = 10.0
+STILL_CRF_OFFSET = 1
+# Below this, mostly static: keyframes can be twice as far apart
+LOW_MOTION_FRACTION = 0.05
+
+
+def shot_budget(shot_type: str | None) -> ShotBudget:
+    return SHOT_BUDGETS.get((shot_type or "STANDARD").upper(), SHOT_BUDGETS["STANDARD"])
+
+
+def cap_keyint(profile: EncodingProfile, seconds: float | None) -> EncodingProfile:
+    """`profile` with keyframes at most `seconds` apart (None: unchanged)."""
+    if not seconds or (profile.keyint_seconds and profile.keyint_seconds <= seconds):
+        return profile
+    return replace(profile, keyint_seconds=seconds)
+
+
+def adapt_profile(
+    profile: EncodingProfile,
+    motion: "MotionStats | None" = None,
+    shot_type: str | None = None,
+    max_keyint_seconds: float | None = None,
+) -> EncodingProfile:
+    """
+    `profile` tuned for one shot: the shot type's budget shifts CRF and
+    keyframe spacing, and measured motion picks the tune (stillimage for
+    near-static shots) and stretches the GOP of low-motion shots, where
+    keyframes are most of the bitrate. `max_keyint_seconds` caps the
+    GOP (see tasks._cut_keyint). Drafts are otherwise left alone.
+    """
+    if profile.name == "draft":
+        return cap_keyint(profile, max_keyint_seconds)
+    budget = shot_budget(shot_type)
+    crf = profile.crf + budget.crf_offset
+    tune = profile.tune
+    keyint = profile.keyint_seconds or 0.0
+    if motion is not None:
+        if motion.changed_fraction < STILL_FRACTION:
+            tune = "stillimage"
+            keyint = max(keyint, STILL_KEYINT_SECONDS)
+            crf += STILL_CRF_OFFSET
+        elif motion.changed_fraction < LOW_MOTION_FRACTION:
+            keyint *= 2
+    keyint *= budget.keyint_scale
+    return cap_keyint(
+        replace(profile, crf=max(0, min(51, crf)), tune=tune, keyint_seconds=keyint or None),
+        max_keyint_seconds,
+    )
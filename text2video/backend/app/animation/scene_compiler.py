@@ -66,6 +66,10 @@ def text_to_scene_spec(text: str) -> SceneSpec:
         spec.clouds = False if "no clouds" in t else spec.clouds
         spec.sun = True if spec.theme != "night" else spec.sun
 
+    # heavy weather: many more particles
+    if spec.weather in ("rain", "snow") and _has_any(t, ["storm", "thunder", "blizzard", "downpour", "heavy"]):
+        spec.precipitation = 10.0
+
     # explicit toggles
     if "no clouds" in t:
         spec.clouds = False
@@ -1,10 +1,124 @@
 from __future__ import annotations
-import subprocess
+
+import os
+import threading
+from collections import OrderedDict
+from concurrent.futures import Future
+from dataclasses import replace
 from pathlib import Path
+from typing import Dict, Tuple
+
 from PIL import Image
 
+from .clip_cache import ClipCache, clip_key
+from .pipeline import concat_copy, draft_settings, encode_frames, loop_copy, trim_copy
 from .scene_spec import SceneSpec
-from .scene_renderer_cartoon import render_scene_frame_cartoon
+from .scene_renderer_cartoon import render_scene_frame_cartoon, scene_motion_speed
+from .shot_fx import ShotFX
+from .profiles import EncodingProfile, get_profile
+
+# Default loop period for long scene shots: long enough that the rounded
+# motions (sun bob, sway, birds, waves) keep their speeds, short enough that
+# a 40s shot renders well under half its frames.
+DEFAULT_LOOP_SECONDS = 16.0
+
+
+# Temporal subsampling: largest motion allowed between two rendered frames,
+# and the lowest internal rate we go down to.
+MAX_STEP_PX = 2.0
+MIN_RENDER_FPS = 5
+
+# Cached scene masters get a keyframe every second, so any whole-second
+# duration is a clean stream-copy cut.
+MASTER_KEYFRAME_SECONDS = 1.0
+
+# Shots with effects keep the scene frames of their first loop period in
+# memory (raw RGB, up to this many MB per shot; SCENE_FRAME_CACHE_MB env), so
+# later periods reuse them. 1 GB holds ~13 s of 1280x720 at 30 fps.
+DEFAULT_FRAME_CACHE_MB = 1024
+# Scene frames past that budget are kept for this many newer ones, long
+# enough for the output frames that hold them (render_fps < fps).
+HELD_SCENE_FRAMES = 8
+
+
+def subsampled_fps(
+    spec: SceneSpec,
+    fps: int,
+    w: int = 1280,
+    h: int = 720,
+    seconds: float = 6.0,
+    max_step_px: float = MAX_STEP_PX,
+) -> int:
+    """
+    Internal render rate for a scene: the smallest divisor of `fps` at which
+    nothing moves more than `max_step_px` between rendered frames. Divisors
+    keep the encoder's retiming to whole-frame blends/repeats. Shot effects
+    are composited at `fps` (see render_scene_to_mp4) and do not count.
+    """
+    speed = scene_motion_speed(spec, w, h, seconds)
+    need = max(min(MIN_RENDER_FPS, fps), speed / max_step_px)
+    return min(d for d in range(1, fps + 1) if fps % d == 0 and (d >= need or d == fps))
+
+
+def scene_loop_period(spec: SceneSpec, fps: int) -> float | None:
+    """
+    Loop period (seconds, a whole number of frames) for the scene, or None if
+    the scene never repeats (sunrise progresses through the whole shot).
+    """
+    if spec.theme == "sunrise":
+        return None
+    frames = max(1, int(round((spec.loop_seconds or DEFAULT_LOOP_SECONDS) * fps)))
+    return frames / fps
+
+
+def default_frame_cache_bytes() -> int:
+    """SCENE_FRAME_CACHE_MB env var, else DEFAULT_FRAME_CACHE_MB (in bytes)."""
+    env = (os.getenv("SCENE_FRAME_CACHE_MB") or "").strip()
+    try:
+        mb = float(env) if env else DEFAULT_FRAME_CACHE_MB
+    except ValueError:
+        mb = DEFAULT_FRAME_CACHE_MB
+    return max(0, int(mb * 1024 * 1024))
+
+
+class SceneFrames:
+    """
+    Scene frames of one shot by index at the render rate, as raw RGB bytes,
+    each rendered once however many output frames use it. The first
+    `max_bytes` worth of indices stay for the whole shot (a looping scene's
+    later periods reuse them); later ones only until HELD_SCENE_FRAMES newer
+    ones were rendered. Safe to share between frame workers.
+    """
+
+    def __init__(self, spec: SceneSpec, w: int, h: int, render_fps: int, seconds: float, max_bytes: int):
+        self.spec = spec
+        self.size = (w, h)
+        self.render_fps = render_fps
+        self.seconds = seconds
+        self.keep = max(0, int(max_bytes) // (w * h * 3))
+        self._kept: Dict[int, Future] = {}
+        self._held: "OrderedDict[int, Future]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, k: int) -> bytes:
+        with self._lock:
+            frames = self._kept if k < self.keep else self._held
+            future = frames.get(k)
+            owner = future is None
+            if owner:
+                # Workers asking for a frame that is still being rendered wait for it.
+                future = frames[k] = Future()
+                while len(self._held) > HELD_SCENE_FRAMES:
+                    self._held.popitem(last=False)
+        if owner:
+            w, h = self.size
+            try:
+                img = render_scene_frame_cartoon(self.spec, k / self.render_fps, w, h, seconds=self.seconds)
+                future.set_result(img.tobytes())
+            except BaseException as e:
+                future.set_exception(e)
+        return future.result()
+
 
 def render_scene_to_mp4(
     spec: SceneSpec,
@@ -13,35 +127,172 @@ def render_scene_to_mp4(
     fps: int = 30,
     w: int = 1280,
     h: int = 720,
+    workers: int | None = None,
+    segment_seconds: float | None = None,
+    loop: bool = True,
+    render_fps: int | None = None,
+    retime: str = "blend",
+    fx: ShotFX | None = None,
+    start: float = 0.0,
+    keyframe_seconds: float | None = None,
+    draft: bool = False,
+    profile: str | EncodingProfile | None = None,
 ) -> str:
+    """
+    Render a scene to `out_mp4` at `fps`.
+
+    `render_fps` (see subsampled_fps) renders fewer frames and has the
+    encoder bring them back to `fps` by blending or duplicating (`retime`).
+    `fx` (camera move, lower-third) is applied to every delivered frame as it
+    is composited, so the shot is encoded once: the scene under it is still
+    drawn at `render_fps` (held, not blended, in between) and, past one loop
+    period, its frames are reused from memory (see SceneFrames).
+    `start` renders the [start, start + seconds) part of the scene instead
+    (used to extend cached masters, see render_scene_cached).
+    `profile` names the encoding profile (default: the server's tier).
+    `draft` renders a preview: the scene is drawn at half size and at most
+    15 fps (not downscaled afterwards) with the "draft" profile.
+    """
+    if draft:
+        w, h, fps = draft_settings(w, h, fps)
+        profile = "draft"
+    profile = get_profile(profile)
+    render_fps = min(fps, int(render_fps)) if render_fps else fps
+    total_frames = int(seconds * render_fps)
+    first = int(round(start * render_fps))
+
+    # A looping scene is drawn with every motion rounded to repeat exactly
+    # over its loop period, whatever the shot length (as the cached masters
+    # are, see render_scene_cached); shots longer than that repeat one period.
+    period = scene_loop_period(spec, render_fps) if loop and not first else None
+    period_frames = int(round(period * render_fps)) if period is not None else 0
+    looping = 0 < period_frames < total_frames
+    if period is not None:
+        spec = replace(spec, loop_seconds=period)
+
+    if fx is not None:
+        # Effects change every delivered frame: composite and encode at `fps`,
+        # the scene frame under output frame i is scene frame i * render_fps // fps.
+        scene = SceneFrames(spec, w, h, render_fps, seconds, default_frame_cache_bytes())
+
+        def shot_frame(i: int) -> bytes:
+            k = first + i * render_fps // fps
+            if period_frames:
+                k %= period_frames
+            img = Image.frombytes("RGB", (w, h), scene.get(k))
+            return fx.apply(img, i / fps).tobytes()
+
+        return encode_frames(
+            shot_frame, int(seconds * fps), out_mp4, w, h, fps,
+            workers=workers, segment_seconds=segment_seconds,
+            keyframe_seconds=keyframe_seconds, encoder_args=profile.x264_args(fps),
+        )
+
+    # Without effects the period is encoded once and looped in stream-copy mode.
+    if looping:
+        out_path = Path(out_mp4)
+        loop_mp4 = str(out_path.parent / f".loop_{out_path.stem}.mp4")
+        try:
+            render_scene_to_mp4(
+                spec, loop_mp4, seconds=period, fps=fps, w=w, h=h,
+                workers=workers, segment_seconds=segment_seconds, loop=False,
+                render_fps=render_fps, retime=retime, keyframe_seconds=keyframe_seconds,
+                profile=profile,
+            )
+            return loop_copy(loop_mp4, str(out_path), total_frames / render_fps)
+        finally:
+            Path(loop_mp4).unlink(missing_ok=True)
+
+    def frame(i: int) -> bytes:
+        t = (first + i) / render_fps
+        return render_scene_frame_cartoon(spec, t, w, h, seconds=seconds).tobytes()
+
+    # Frames render in parallel and are piped to ffmpeg as raw RGB
+    # (optionally as concurrently encoded segments joined by stream copy)
+    return encode_frames(
+        frame, total_frames, out_mp4, w, h, render_fps,
+        workers=workers, segment_seconds=segment_seconds,
+        output_fps=fps, retime=retime, keyframe_seconds=keyframe_seconds,
+        encoder_args=profile.x264_args(fps),
+    )
+
+
+def render_scene_cached(
+    cache: ClipCache,
+    spec: SceneSpec,
+    out_mp4: str,
+    seconds: float = 6.0,
+    fps: int = 30,
+    w: int = 1280,
+    h: int = 720,
+    render_fps: int | None = None,
+    retime: str = "blend",
+    profile: str | EncodingProfile | None = None,
+) -> Tuple[str, bool]:
+    """
+    render_scene_to_mp4 through `cache`. Returns (path, hit).
+
+    A looping scene is the same clip whatever the shot length: frame t only
+    depends on t. Such scenes are cached as one master per spec (motions
+    rounded to the loop period, keyframe every second), kept at the longest
+    length asked for so far, up to one period:
+    - shorter shots are a stream-copy trim of the master,
+    - longer ones render only the missing tail and append it to the master,
+    - shots beyond one period loop the master in stream-copy mode.
+    Sunrise scenes are cached per exact duration. Shots with effects render
+    in one pass instead (render_scene_to_mp4 with `fx`).
+    The encoding profile is part of the key, so draft and final clips never mix.
+    """
+    profile = get_profile(profile)
+    render_fps = min(fps, int(render_fps)) if render_fps else fps
+    period = scene_loop_period(spec, render_fps)
+    if period is None:
+        key = clip_key(
+            "scene", spec, seconds=seconds, fps=fps, w=w, h=h, render_fps=render_fps,
+            retime=retime, profile=profile,
+        )
+        return cache.render(
+            key,
+            out_mp4,
+            lambda dest: render_scene_to_mp4(
+                spec, dest, seconds=seconds, fps=fps, w=w, h=h,
+                render_fps=render_fps, retime=retime, profile=profile,
+            ),
+        )
+
+    looped = replace(spec, loop_seconds=period)
+    key = clip_key(
+        "scene-master", looped, fps=fps, w=w, h=h, render_fps=render_fps,
+        retime=retime, keyframe_seconds=MASTER_KEYFRAME_SECONDS, profile=profile,
+    )
+    need = min(float(seconds), period)
+    found = cache.master(key)
+    have = found[1] if found else 0.0
+    hit = found is not None and have >= need - 1e-6
+    cache.count(hit)
+
     out_path = Path(out_mp4)
-    out_path.parent.mkdir(parents=True, exist_ok=True)
-
-    tmp_dir = out_path.parent / f".frames_{out_path.stem}"
-    if tmp_dir.exists():
-        for p in tmp_dir.glob("*.png"):
-            p.unlink()
-    tmp_dir.mkdir(parents=True, exist_ok=True)
-
-    total_frames = int(seconds * fps)
-    for i in range(total_frames):
-        t = i / fps
-        img: Image.Image = render_scene_frame_cartoon(spec, t, w, h, seconds=seconds)
-        img.save(tmp_dir / f"frame_{i:06d}.png", "PNG")
-
-    cmd = [
-        "ffmpeg", "-y",
-        "-framerate", str(fps),
-        "-i", str(tmp_dir / "frame_%06d.png"),
-        "-c:v", "libx264",
-        "-pix_fmt", "yuv420p",
-        "-movflags", "+faststart",
-        str(out_path),
-    ]
-    subprocess.run(cmd, check=True, capture_output=True, text=True)
-
-    for p in tmp_dir.glob("*.png"):
-        p.unlink()
-    tmp_dir.rmdir()
-
-    return str(out_path)
+    # `out_mp4` may be a hardlink into the cache from an earlier hit.
+    out_path.unlink(missing_ok=True)
+    if hit:
+        master, length = found
+    else:
+        tail = str(out_path.parent / f".tail_{out_path.stem}.mp4")
+        joined = str(out_path.parent / f".master_{out_path.stem}.mp4")
+        try:
+            render_scene_to_mp4(
+                looped, tail, seconds=need - have, fps=fps, w=w, h=h, loop=False,
+                render_fps=render_fps, retime=retime,
+                start=have, keyframe_seconds=MASTER_KEYFRAME_SECONDS, profile=profile,
+            )
+            src = concat_copy([str(found[0]), tail], joined) if found else tail
+            master, length = cache.put_master(key, src, need), need
+        finally:
+            Path(tail).unlink(missing_ok=True)
+            Path(joined).unlink(missing_ok=True)
+
+    if seconds > length + 1e-6:
+        return loop_copy(str(master), out_mp4, seconds), hit
+    if seconds < length - 1e-6:
+        return trim_copy(str(master), out_mp4, seconds), hit
+    return cache.place(master, out_mp4), hit
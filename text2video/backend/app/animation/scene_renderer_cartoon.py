@@ -1,9 +1,16 @@
 from __future__ import annotations
 import math
 import random
+from dataclasses import astuple
+from typing import Callable, Dict, Hashable, List, Tuple
 from PIL import Image, ImageDraw, ImageFilter
 
+from .cache import LRUCache
+from .compositor import Compositor, thread_compositor
+from .particles import ParticleField, rain_stamp, snow_stamp
+from .plates import blend_plates, gradient_plate, gradient_plate_image, plate_image
 from .scene_spec import SceneSpec
+from .sprites import Sprite
 
 def clamp01(x: float) -> float:
     return 0.0 if x < 0 else 1.0 if x > 1 else x
@@ -19,171 +26,273 @@ def lerp_rgb(c1, c2, t: float):
         int(lerp(c1[2], c2[2], t)),
     )
 
-def _gradient(w: int, h: int, top, bottom) -> Image.Image:
-    img = Image.new("RGB", (w, h), top)
-    px = img.load()
-    for y in range(h):
-        t = y / max(1, h - 1)
-        c = lerp_rgb(top, bottom, t)
-        for x in range(w):
-            px[x, y] = c
-    return img
-
-def _soft_vignette(img: Image.Image, strength: float = 0.25) -> Image.Image:
-    w, h = img.size
-    mask = Image.new("L", (w, h), 0)
-    d = ImageDraw.Draw(mask)
-    r = int(math.hypot(w, h) * 0.55)
-    d.ellipse([w//2 - r, h//2 - r, w//2 + r, h//2 + r], fill=255)
-    mask = mask.filter(ImageFilter.GaussianBlur(80))
-    dark = Image.new("RGB", (w, h), (0, 0, 0))
-    out = Image.composite(img, dark, mask)  # center keeps img, corners darken
-    return Image.blend(img, out, strength)
-
-def _glow_circle(base: Image.Image, cx: int, cy: int, r: int, color, glow: int = 45, alpha: int = 120):
-    w, h = base.size
-    layer = Image.new("RGBA", (w, h), (0, 0, 0, 0))
-    d = ImageDraw.Draw(layer)
-    d.ellipse([cx - r - glow, cy - r - glow, cx + r + glow, cy + r + glow], fill=color + (alpha,))
-    layer = layer.filter(ImageFilter.GaussianBlur(int(0.7 * glow)))
-    d = ImageDraw.Draw(layer)
-    d.ellipse([cx - r, cy - r, cx + r, cy + r], fill=color + (255,))
-    out = Image.alpha_composite(base.convert("RGBA"), layer)
-    return out.convert("RGB")
+_SUNRISE_START = ((15, 25, 55), (40, 20, 60))
+_SUNRISE_END = ((90, 170, 255), (255, 175, 120))
+
+# Cloud layers drift right at (px/s, off-screen run-up px), each wrapping
+# around over the frame width plus its run-up.
+_CLOUD_LAYERS = ((24, 260), (14, 300))
+
+def _omega(spec: SceneSpec, omega: float) -> float:
+    # Angular frequency rounded to whole cycles per loop period (loop mode).
+    if not spec.loop_seconds:
+        return omega
+    cycles = max(1, round(omega * spec.loop_seconds / (2 * math.pi)))
+    return 2 * math.pi * cycles / spec.loop_seconds
+
+def _cloud_xs(spec: SceneSpec, t: float, speed: float, run: int, x: int, w: int) -> List[int]:
+    # Where a cloud resting at `x` is drawn as it drifts right at `speed`: one
+    # cloud wrapping over the frame plus its run-up, or in loop mode a row of
+    # copies `speed * loop_seconds` apart, which repeats exactly every period
+    # at the real speed.
+    if not spec.loop_seconds:
+        return [int((t * speed) % (w + run)) - run + x]
+    gap = speed * spec.loop_seconds
+    xs, cx = [], (x + run + t * speed) % gap - run
+    while cx < w + run:
+        xs.append(int(cx))
+        cx += gap
+    return xs
+
+def _sky_palette(theme: str):
+    # Sky palettes by theme (Pixar-ish)
+    if theme == "night":
+        return (10, 16, 40), (30, 40, 70)
+    if theme == "rainy":
+        return (70, 90, 120), (120, 140, 170)
+    if theme == "snowy":
+        return (150, 190, 235), (230, 245, 255)
+    if theme == "beach":
+        return (90, 180, 255), (255, 210, 170)
+    return (85, 170, 255), (200, 235, 255)  # day/forest/city
 
-def _rounded_hill(base: Image.Image, y: int, color, wobble: float = 0.0):
-    w, h = base.size
-    layer = Image.new("RGBA", (w, h), (0, 0, 0, 0))
+def _sky(spec: SceneSpec, p: float, w: int, h: int) -> Image.Image:
+    # RGBA sky to paste into the compositor; constant skies are shared plates.
+    strength = 0.18 * spec.softness
+    if spec.theme == "sunrise":
+        # Gradient + vignette are linear in the palette, so the lerp between the
+        # two cached endpoint plates equals the plate of the lerped palette.
+        a = gradient_plate(w, h, *_SUNRISE_START, vignette="soft", strength=strength)
+        b = gradient_plate(w, h, *_SUNRISE_END, vignette="soft", strength=strength)
+        return plate_image(blend_plates(a, b, p), "RGBA")
+    top, bottom = _sky_palette(spec.theme)
+    return gradient_plate_image(w, h, top, bottom, vignette="soft", strength=strength)
+
+def _local_layer(x0: int, y0: int, x1: int, y1: int):
+    # Transparent RGBA layer covering only the box [x0, x1) x [y0, y1);
+    # callers draw in coordinates relative to (x0, y0).
+    layer = Image.new("RGBA", (max(1, x1 - x0), max(1, y1 - y0)), (0, 0, 0, 0))
+    return layer, ImageDraw.Draw(layer)
+
+def _sprite(layer: Image.Image, ox: int, oy: int) -> Sprite | None:
+    # Crop a rasterized element to its visible pixels; (ox, oy) is where the
+    # layer's top-left sits relative to the element's anchor.
+    bbox = layer.getbbox()
+    if not bbox:
+        return None
+    return Sprite(layer.crop(bbox), ox + bbox[0], oy + bbox[1])
+
+def _glow_circle(r: int, color, glow: int = 45, alpha: int = 120) -> Sprite | None:
+    # anchored at the circle's center
+    blur = int(0.7 * glow)
+    R = r + glow + 3 * blur + 1
+    layer, d = _local_layer(-R, -R, R + 1, R + 1)
+    d.ellipse([R - r - glow, R - r - glow, R + r + glow, R + r + glow], fill=color + (alpha,))
+    layer = layer.filter(ImageFilter.GaussianBlur(blur))
     d = ImageDraw.Draw(layer)
+    d.ellipse([R - r, R - r, R + r, R + r], fill=color + (255,))
+    return _sprite(layer, -R, -R)
+
+def _rounded_hill(w: int, h: int, y: int, color, wobble: float = 0.0) -> Sprite | None:
+    # Only the part of the (much larger) ellipse that lands on the canvas;
+    # anchored at the canvas origin.
+    y0 = max(0, y - int(h*0.28) - 6)
+    layer, d = _local_layer(0, y0, w, h)
     # big rounded ground
-    d.ellipse([-w//2, y - int(h*0.25), w + w//2, h + int(h*0.45)], fill=color + (255,))
+    d.ellipse([-w//2, y - int(h*0.25) - y0, w + w//2, h + int(h*0.45) - y0], fill=color + (255,))
     if wobble:
         # subtle highlight band
-        d.ellipse([-w//2, y - int(h*0.28), w + w//2, h + int(h*0.40)], fill=(255, 255, 255, 30))
-    out = Image.alpha_composite(base.convert("RGBA"), layer.filter(ImageFilter.GaussianBlur(2)))
-    return out.convert("RGB")
+        d.ellipse([-w//2, y - int(h*0.28) - y0, w + w//2, h + int(h*0.40) - y0], fill=(255, 255, 255, 30))
+    return _sprite(layer.filter(ImageFilter.GaussianBlur(2)), 0, y0)
 
-def _cloud(base: Image.Image, x: int, y: int, s: float, alpha: int = 200):
-    w, h = base.size
-    layer = Image.new("RGBA", (w, h), (0, 0, 0, 0))
-    d = ImageDraw.Draw(layer)
+def _cloud(s: float, alpha: int = 200) -> Sprite | None:
+    # anchored at the first puff's center
     c = (255, 255, 255, alpha)
     r = int(34 * s)
+    blur = int(6*s)
     parts = [
-        (x, y, r),
-        (x + int(0.9*r), y - int(0.35*r), int(1.15*r)),
-        (x + int(2.0*r), y, r),
-        (x + int(1.0*r), y + int(0.35*r), int(1.25*r)),
+        (0, 0, r),
+        (int(0.9*r), -int(0.35*r), int(1.15*r)),
+        (int(2.0*r), 0, r),
+        (int(1.0*r), int(0.35*r), int(1.25*r)),
     ]
+    pad = 3 * blur + 1
+    x0 = min(cx - rr for cx, _, rr in parts) - pad
+    y0 = min(cy - rr for _, cy, rr in parts) - pad
+    x1 = max(cx + rr for cx, _, rr in parts) + pad + 1
+    y1 = max(cy + rr for _, cy, rr in parts) + pad + 1
+    layer, d = _local_layer(x0, y0, x1, y1)
     for cx, cy, rr in parts:
-        d.ellipse([cx-rr, cy-rr, cx+rr, cy+rr], fill=c)
-    layer = layer.filter(ImageFilter.GaussianBlur(int(6*s)))
-    out = Image.alpha_composite(base.convert("RGBA"), layer)
-    return out.convert("RGB")
+        d.ellipse([cx-rr-x0, cy-rr-y0, cx+rr-x0, cy+rr-y0], fill=c)
+    return _sprite(layer.filter(ImageFilter.GaussianBlur(blur)), x0, y0)
 
-def _bird(base: Image.Image, x: int, y: int, size: int = 16, alpha: int = 200):
-    layer = Image.new("RGBA", base.size, (0, 0, 0, 0))
-    d = ImageDraw.Draw(layer)
+def _bird(size: int = 16, alpha: int = 200) -> Sprite | None:
+    # anchored at the glyph's top-left
+    layer, d = _local_layer(0, 0, 2*size + 1, size + 1)
     c = (30, 30, 30, alpha)
-    d.arc([x, y, x + size, y + size], start=200, end=340, fill=c, width=3)
-    d.arc([x + size, y, x + 2*size, y + size], start=200, end=340, fill=c, width=3)
-    out = Image.alpha_composite(base.convert("RGBA"), layer)
-    return out.convert("RGB")
-
-def _trees(base: Image.Image, t: float, density: int = 6):
-    w, h = base.size
-    layer = Image.new("RGBA", (w, h), (0,0,0,0))
-    d = ImageDraw.Draw(layer)
+    d.arc([0, 0, size, size], start=200, end=340, fill=c, width=3)
+    d.arc([size, 0, 2*size, size], start=200, end=340, fill=c, width=3)
+    return _sprite(layer, 0, 0)
 
+def _trees(w: int, density: int = 6) -> List[Tuple[float, Sprite | None]]:
+    # One sprite per tree, anchored at (trunk center, ground); returned with
+    # the tree's resting x so the per-frame sway is just the blit position.
     rng = random.Random(1234)  # deterministic
-    ground = int(h * 0.70)
+    pad = 3 * 1 + 1
+    trees = []
     for i in range(density):
-        x = int((i + 0.5) * (w / density) + math.sin(t*0.5 + i) * 6)
         trunk_h = rng.randint(60, 90)
         trunk_w = rng.randint(10, 14)
-        d.rounded_rectangle([x-trunk_w//2, ground-trunk_h, x+trunk_w//2, ground], radius=6, fill=(90, 60, 40, 255))
-        # canopy
         rr = rng.randint(40, 55)
-        d.ellipse([x-rr, ground-trunk_h-rr, x+rr, ground-trunk_h+rr], fill=(40, 140, 70, 235))
-        d.ellipse([x-rr-18, ground-trunk_h-rr+10, x+rr-18, ground-trunk_h+rr+10], fill=(30, 120, 60, 210))
-
-    out = Image.alpha_composite(base.convert("RGBA"), layer.filter(ImageFilter.GaussianBlur(1)))
-    return out.convert("RGB")
+        x0, y0 = -rr - 18 - pad, -trunk_h - rr - pad
+        layer, d = _local_layer(x0, y0, max(rr, trunk_w//2) + pad + 1, max(0, rr + 10 - trunk_h) + pad + 1)
+        x, g = -x0, -y0
+        d.rounded_rectangle([x-trunk_w//2, g-trunk_h, x+trunk_w//2, g], radius=6, fill=(90, 60, 40, 255))
+        # canopy
+        d.ellipse([x-rr, g-trunk_h-rr, x+rr, g-trunk_h+rr], fill=(40, 140, 70, 235))
+        d.ellipse([x-rr-18, g-trunk_h-rr+10, x+rr-18, g-trunk_h+rr+10], fill=(30, 120, 60, 210))
+        trees.append(((i + 0.5) * (w / density), _sprite(layer.filter(ImageFilter.GaussianBlur(1)), x0, y0)))
+    return trees
 
-def _skyline(base: Image.Image, t: float):
-    w, h = base.size
-    layer = Image.new("RGBA", (w, h), (0,0,0,0))
-    d = ImageDraw.Draw(layer)
-    ground = int(h * 0.70)
+def _skyline(w: int) -> Sprite | None:
+    # The whole strip drifts as one, anchored at (0, ground).
+    pad = 2 * 3 + 1
+    # tallest building is 230px
+    y0 = -230 - pad
+    layer, d = _local_layer(-pad, y0, w + 90 + 14 + pad, pad + 1)
+    g = -y0
 
     rng = random.Random(777)
     x = 0
     while x < w:
         bw = rng.randint(40, 90)
         bh = rng.randint(90, 230)
-        # slight parallax drift
-        dx = int(math.sin(t*0.2) * 4)
-        d.rounded_rectangle([x+dx, ground-bh, x+bw+dx, ground], radius=8, fill=(25, 35, 60, 220))
+        lx = x + pad
+        d.rounded_rectangle([lx, g-bh, lx+bw, g], radius=8, fill=(25, 35, 60, 220))
         # windows
-        wx = x + 10 + dx
-        wy = ground - bh + 14
+        wx = lx + 10
+        wy = g - bh + 14
         for _ in range(rng.randint(6, 10)):
             d.rectangle([wx, wy, wx+8, wy+10], fill=(255, 230, 140, 140))
             wx += 14
-            if wx > x + bw - 12 + dx:
-                wx = x + 10 + dx
+            if wx > lx + bw - 12:
+                wx = lx + 10
                 wy += 18
         x += bw + rng.randint(6, 14)
 
-    out = Image.alpha_composite(base.convert("RGBA"), layer.filter(ImageFilter.GaussianBlur(2)))
-    return out.convert("RGB")
+    return _sprite(layer.filter(ImageFilter.GaussianBlur(2)), -pad, y0)
 
-def _rain(base: Image.Image, t: float, intensity: int = 120):
-    w, h = base.size
-    layer = Image.new("RGBA", (w, h), (0,0,0,0))
-    d = ImageDraw.Draw(layer)
-    rng = random.Random(999)
-    for i in range(intensity):
-        x = (rng.randint(0, w) + int(t*240)) % w
-        y = (rng.randint(0, h) + int(t*520)) % h
-        d.line([x, y, x-10, y+22], fill=(200, 220, 255, 120), width=2)
-    out = Image.alpha_composite(base.convert("RGBA"), layer.filter(ImageFilter.GaussianBlur(1)))
-    return out.convert("RGB")
-
-def _snow(base: Image.Image, t: float, intensity: int = 90):
-    w, h = base.size
-    layer = Image.new("RGBA", (w, h), (0,0,0,0))
-    d = ImageDraw.Draw(layer)
-    rng = random.Random(555)
-    for i in range(intensity):
-        x = (rng.randint(0, w) + int(t*60)) % w
-        y = (rng.randint(0, h) + int(t*120)) % h
-        r = rng.randint(2, 4)
-        d.ellipse([x-r, y-r, x+r, y+r], fill=(255, 255, 255, 170))
-    out = Image.alpha_composite(base.convert("RGBA"), layer.filter(ImageFilter.GaussianBlur(0.5)))
-    return out.convert("RGB")
+_MISSING = object()
+
+class SceneAtlas:
+    """
+    Pre-rasterized (and pre-blurred, cropped) elements of one scene at one
+    frame size: sun/moon glows, cloud puffs per scale, bird glyphs, hills,
+    trees, the skyline strip and the rain/snow particle fields. Their
+    geometry only depends on the spec and the frame size, so a frame is a
+    handful of offset blits for the drift.
+    Sprites are built on first use and then shared by all frame workers.
+    """
+
+    def __init__(self, spec: SceneSpec, w: int, h: int):
+        self.spec = spec
+        self.size = (w, h)
+        self._sprites: Dict[Hashable, object] = {}
+
+    def _get(self, key: Hashable, build: Callable[[], object]):
+        value = self._sprites.get(key, _MISSING)
+        if value is _MISSING:
+            # Racing workers may both build it; the results are identical.
+            value = self._sprites[key] = build()
+        return value
+
+    def glow_circle(self, r: int, color, glow: int, alpha: int) -> Sprite | None:
+        return self._get(("glow", r, color, glow, alpha), lambda: _glow_circle(r, color, glow=glow, alpha=alpha))
+
+    def hill(self, y: int, color, wobble: float = 0.0) -> Sprite | None:
+        w, h = self.size
+        return self._get(("hill", y, color, wobble), lambda: _rounded_hill(w, h, y, color, wobble=wobble))
+
+    def cloud(self, s: float, alpha: int) -> Sprite | None:
+        return self._get(("cloud", s, alpha), lambda: _cloud(s, alpha=alpha))
+
+    def bird(self, size: int, alpha: int = 200) -> Sprite | None:
+        return self._get(("bird", size, alpha), lambda: _bird(size, alpha=alpha))
+
+    def trees(self, density: int) -> List[Tuple[float, Sprite | None]]:
+        return self._get(("trees", density), lambda: _trees(self.size[0], density=density))
+
+    def skyline(self) -> Sprite | None:
+        return self._get(("skyline",), lambda: _skyline(self.size[0]))
+
+    def rain(self, intensity: int) -> ParticleField:
+        return self._get(("rain", intensity), lambda: _rain(*self.size, intensity=intensity, period=self.spec.loop_seconds))
+
+    def snow(self, intensity: int) -> ParticleField:
+        return self._get(("snow", intensity), lambda: _snow(*self.size, intensity=intensity, period=self.spec.loop_seconds))
+
+_atlases: LRUCache[SceneAtlas] = LRUCache(maxsize=8)
+
+def scene_atlas(spec: SceneSpec, w: int, h: int) -> SceneAtlas:
+    return _atlases.get_or_create((astuple(spec), w, h), lambda: SceneAtlas(spec, w, h))
+
+def _blit(comp: Compositor, sprite: Sprite | None, x: int, y: int):
+    if sprite is not None:
+        comp.blit(sprite, x, y)
+
+def _rain(w: int, h: int, intensity: int = 120, period: float | None = None) -> ParticleField:
+    return ParticleField(
+        intensity, w, h, velocity=(240, 520), stamps=[rain_stamp()], color=(200, 220, 255), seed=999, period=period,
+    )
+
+def _snow(w: int, h: int, intensity: int = 90, period: float | None = None) -> ParticleField:
+    stamps = [snow_stamp(r) for r in (2, 3, 4)]
+    return ParticleField(
+        intensity, w, h, velocity=(60, 120), stamps=stamps, color=(255, 255, 255), seed=555,
+        speed_jitter=0.25, sway=10, period=period,
+    )
+
+def scene_motion_speed(spec: SceneSpec, w: int, h: int, seconds: float) -> float:
+    """Fastest on-screen motion of the scene in px/s (mirrors render_scene_frame_cartoon)."""
+    speeds = [0.0]
+    if spec.sun and spec.theme != "night":
+        # sunrise: the sun climbs h*0.36 - 10 px over the shot
+        speeds.append((h * 0.36 - 10) / max(0.001, seconds) if spec.theme == "sunrise" else 6 * 0.6)
+    if spec.moon:
+        speeds.append(4 * 0.3)
+    if spec.clouds:
+        speeds.append(24)
+    if spec.theme == "beach":
+        speeds.append(2 * 1.2)
+    if spec.trees or spec.theme == "forest":
+        speeds.append(6 * 0.5)
+    if spec.skyline or spec.theme == "city":
+        speeds.append(4 * 0.2)
+    if spec.birds and spec.theme not in ("rainy", "snowy"):
+        speeds.append(math.hypot(55 * 1.2, 18 * 1.05))
+    if spec.weather == "rain":
+        speeds.append(math.hypot(240, 520) * 1.1)
+    if spec.weather == "snow":
+        speeds.append(math.hypot(60, 120) * 1.25 + 10 * 1.4)
+    return max(speeds)
 
 def render_scene_frame_cartoon(spec: SceneSpec, t: float, w: int, h: int, seconds: float) -> Image.Image:
     # normalize progress
     p = clamp01(t / max(0.001, seconds))
 
-    # Sky palettes by theme (Pixar-ish)
-    if spec.theme == "sunrise":
-        top = lerp_rgb((15, 25, 55), (90, 170, 255), p)
-        bottom = lerp_rgb((40, 20, 60), (255, 175, 120), p)
-    elif spec.theme == "night":
-        top, bottom = (10, 16, 40), (30, 40, 70)
-    elif spec.theme == "rainy":
-        top, bottom = (70, 90, 120), (120, 140, 170)
-    elif spec.theme == "snowy":
-        top, bottom = (150, 190, 235), (230, 245, 255)
-    elif spec.theme == "beach":
-        top, bottom = (90, 180, 255), (255, 210, 170)
-    else:  # day/forest/city
-        top, bottom = (85, 170, 255), (200, 235, 255)
-
-    img = _gradient(w, h, top, bottom)
-    img = _soft_vignette(img, 0.18 * spec.softness)
+    atlas = scene_atlas(spec, w, h)
+    comp = thread_compositor(w, h)
+    comp.begin(_sky(spec, p, w, h))
 
     horizon = int(h * 0.70)
 
@@ -194,63 +303,68 @@ def render_scene_frame_cartoon(spec: SceneSpec, t: float, w: int, h: int, second
         if spec.theme == "sunrise":
             sun_y = int(horizon - lerp(10, h * 0.36, p))
         else:
-            sun_y = int(h * 0.24 + math.sin(t * 0.6) * 6)
-        img = _glow_circle(img, sun_x, sun_y, int(h * 0.07), (255, 220, 140), glow=int(52 * spec.softness), alpha=120)
+            sun_y = int(h * 0.24 + math.sin(t * _omega(spec, 0.6)) * 6)
+        _blit(comp, atlas.glow_circle(int(h * 0.07), (255, 220, 140), glow=int(52 * spec.softness), alpha=120), sun_x, sun_y)
 
     if spec.moon:
         moon_x = int(w * 0.75)
-        moon_y = int(h * 0.22 + math.sin(t * 0.3) * 4)
-        img = _glow_circle(img, moon_x, moon_y, int(h * 0.055), (220, 230, 255), glow=int(36 * spec.softness), alpha=90)
+        moon_y = int(h * 0.22 + math.sin(t * _omega(spec, 0.3)) * 4)
+        _blit(comp, atlas.glow_circle(int(h * 0.055), (220, 230, 255), glow=int(36 * spec.softness), alpha=90), moon_x, moon_y)
 
     # Clouds with parallax drift
     if spec.clouds:
-        drift1 = int((t * 24) % (w + 260)) - 260
-        drift2 = int((t * 14) % (w + 300)) - 300
-        img = _cloud(img, drift1 + 220, int(h * 0.18), 1.25, alpha=210 if spec.weather != "clear" else 190)
-        img = _cloud(img, drift2 + 640, int(h * 0.26), 0.95, alpha=200 if spec.weather != "clear" else 170)
+        (speed1, run1), (speed2, run2) = _CLOUD_LAYERS
+        front = atlas.cloud(1.25, alpha=210 if spec.weather != "clear" else 190)
+        back = atlas.cloud(0.95, alpha=200 if spec.weather != "clear" else 170)
+        for x in _cloud_xs(spec, t, speed1, run1, 220, w):
+            _blit(comp, front, x, int(h * 0.18))
+        for x in _cloud_xs(spec, t, speed2, run2, 640, w):
+            _blit(comp, back, x, int(h * 0.26))
         if spec.weather in ("cloudy", "rain", "snow"):
-            img = _cloud(img, drift1 + 940, int(h * 0.16), 1.45, alpha=220)
+            for x in _cloud_xs(spec, t, speed1, run1, 940, w):
+                _blit(comp, atlas.cloud(1.45, alpha=220), x, int(h * 0.16))
 
     # Ground layers (rounded, toy-like)
     if spec.theme in ("beach",):
         # sand
-        img = _rounded_hill(img, horizon + 20, (235, 210, 155), wobble=1.0)
+        _blit(comp, atlas.hill(horizon + 20, (235, 210, 155), wobble=1.0), 0, 0)
         # ocean band
         ocean_y = horizon - 10
-        d = ImageDraw.Draw(img)
-        d.rectangle([0, ocean_y, w, horizon + 20], fill=(60, 150, 220))
+        d = ImageDraw.Draw(comp.canvas)
+        d.rectangle([0, ocean_y, w, horizon + 20], fill=(60, 150, 220, 255))
         # wave highlights
-        wave = Image.new("RGBA", (w, h), (0,0,0,0))
-        dw = ImageDraw.Draw(wave)
+        wx0, wy0 = int(w*0.10) - 4, ocean_y + 4
+        wave, dw = _local_layer(wx0, wy0, int(w*0.90) + 5, ocean_y + 10 + 60 + 2 + 24 + 5)
         for i in range(7):
-            yy = ocean_y + 10 + i * 10 + int(math.sin(t*1.2 + i) * 2)
-            dw.arc([int(w*0.10), yy, int(w*0.90), yy+24], start=10, end=170, fill=(255,255,255,80), width=3)
-        wave = wave.filter(ImageFilter.GaussianBlur(1))
-        img = Image.alpha_composite(img.convert("RGBA"), wave).convert("RGB")
+            yy = ocean_y + 10 + i * 10 + int(math.sin(t*_omega(spec, 1.2) + i) * 2)
+            dw.arc([int(w*0.10) - wx0, yy - wy0, int(w*0.90) - wx0, yy + 24 - wy0], start=10, end=170, fill=(255,255,255,80), width=3)
+        comp.composite(wave.filter(ImageFilter.GaussianBlur(1)), wx0, wy0)
     else:
         # grass/ground
         ground_color = (30, 110, 55) if spec.theme != "snowy" else (235, 245, 255)
-        img = _rounded_hill(img, horizon + 30, ground_color, wobble=1.0)
+        _blit(comp, atlas.hill(horizon + 30, ground_color, wobble=1.0), 0, 0)
         if spec.theme == "forest":
-            img = _rounded_hill(img, horizon + 70, (20, 90, 45), wobble=0.0)
+            _blit(comp, atlas.hill(horizon + 70, (20, 90, 45), wobble=0.0), 0, 0)
 
     # Extra elements: trees/skyline
     if spec.trees or spec.theme == "forest":
-        img = _trees(img, t, density=7)
+        for i, (x, tree) in enumerate(atlas.trees(7)):
+            _blit(comp, tree, int(x + math.sin(t*_omega(spec, 0.5) + i) * 6), horizon)
     if spec.skyline or spec.theme == "city":
-        img = _skyline(img, t)
+        # slight parallax drift
+        _blit(comp, atlas.skyline(), int(math.sin(t*_omega(spec, 0.2)) * 4), horizon)
 
     # Birds
     if spec.birds and spec.theme not in ("rainy", "snowy"):
-        bx = int(w * 0.62 + math.sin(t * 1.2) * 55)
-        by = int(h * 0.22 + math.cos(t * 1.05) * 18)
-        img = _bird(img, bx, by, size=16)
-        img = _bird(img, bx + 40, by + 10, size=14, alpha=180)
+        bx = int(w * 0.62 + math.sin(t * _omega(spec, 1.2)) * 55)
+        by = int(h * 0.22 + math.cos(t * _omega(spec, 1.05)) * 18)
+        _blit(comp, atlas.bird(16), bx, by)
+        _blit(comp, atlas.bird(14, alpha=180), bx + 40, by + 10)
 
     # Rain/Snow particles
     if spec.weather == "rain":
-        img = _rain(img, t, intensity=150)
+        atlas.rain(int(150 * spec.precipitation)).draw(comp.canvas, t)
     if spec.weather == "snow":
-        img = _snow(img, t, intensity=110)
+        atlas.snow(int(110 * spec.precipitation)).draw(comp.canvas, t)
 
-    return img
+    return comp.output()
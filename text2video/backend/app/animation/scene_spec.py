@@ -30,3 +30,8 @@ class SceneSpec:
     # style knobs
     saturation: float = 1.0
     softness: float = 1.0  # blur/glow intensity
+    precipitation: float = 1.0  # rain/snow particle count multiplier
+
+    # When set, every motion is rounded to repeat exactly every loop_seconds
+    # (see scene_encode: long shots render one period and loop it).
+    loop_seconds: float | None = None
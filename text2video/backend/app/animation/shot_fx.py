@@ -0,0 +1,171 @@
+from __future__ import annotations
+
+import math
+from dataclasses import dataclass
+from typing import Any, Dict, Tuple
+
+from PIL import Image
+
+from .cache import LRUCache
+from .sprites import Sprite, blit, text_sprite
+
+# Lower-third layout (same numbers the ffmpeg drawtext pass used)
+CAPTION_BOX_H = 160
+CAPTION_PAD = 28
+CAPTION_SLIDE_PX = 50
+CAPTION_SLIDE_S = 0.5
+CAPTION_FADE_S = 0.35
+
+_captions: LRUCache[Sprite | None] = LRUCache(maxsize=64)
+
+
+# -----------------------------
+# Camera (Ken Burns / pan)
+# -----------------------------
+@dataclass(frozen=True)
+class Camera:
+    """
+    Virtual camera over a rendered frame: "kenburns" zooms from 1x to
+    1 + intensity about the center over the shot, "pan" looks through a
+    1/1.2 window that travels right by `intensity` of the frame width.
+    """
+
+    kind: str = "kenburns"
+    intensity: float = 0.18
+    seconds: float = 6.0
+
+    def box(self, t: float, w: int, h: int) -> Tuple[float, float, float, float]:
+        p = min(1.0, max(0.0, t / max(0.001, self.seconds)))
+        if self.kind == "pan":
+            cw, ch = w / 1.2, h / 1.2
+            x0 = min(w - cw, self.intensity * w) * p
+            y0 = (h - ch) / 2
+            return (x0, y0, x0 + cw, y0 + ch)
+        z = 1 + self.intensity * p
+        cw, ch = w / z, h / z
+        x0, y0 = (w - cw) / 2, (h - ch) / 2
+        return (x0, y0, x0 + cw, y0 + ch)
+
+    def apply(self, img: Image.Image, t: float) -> Image.Image:
+        # One resample per frame, straight from the crop window.
+        return img.resize(img.size, Image.BILINEAR, box=self.box(t, *img.size))
+
+    def motion_speed(self, w: int, h: int) -> float:
+        """Fastest on-screen motion the camera adds, in px/s."""
+        if self.kind == "pan":
+            return 1.2 * min(w - w / 1.2, self.intensity * w) / max(0.001, self.seconds)
+        # frame corners move the most while zooming
+        return self.intensity * math.hypot(w, h) / 2 / max(0.001, self.seconds)
+
+
+# -----------------------------
+# Lower-third caption
+# -----------------------------
+def _px(v: float, scale: float) -> int:
+    return max(1, int(round(v * scale)))
+
+
+def _rasterize_lower_third(title: str, sub: str, w: int, scale: float = 1.0) -> Sprite | None:
+    if not title and not sub:
+        return None
+    box = Image.new("RGBA", (w - 2 * _px(CAPTION_PAD, scale), _px(CAPTION_BOX_H, scale)), (0, 0, 0, 115))
+    if title:
+        sprite = text_sprite(title, _px(44, scale), (255, 255, 255), shadow_blur=0, shadow_alpha=140)
+        blit(box, sprite, _px(22, scale), _px(20, scale))
+    if sub:
+        sprite = text_sprite(sub, _px(28, scale), (255, 255, 255), shadow_blur=0, shadow_alpha=115)
+        blit(box, sprite, _px(22, scale), _px(78, scale))
+    return Sprite(box)
+
+
+def lower_third_sprite(title: str, sub: str, w: int, scale: float = 1.0) -> Sprite | None:
+    """
+    Caption box + title + subline as one RGBA sprite, rasterized once per
+    caption. Its top-left goes at lower_third_origin(). `scale` shrinks the
+    layout for reduced-size (draft) frames.
+    """
+    return _captions.get_or_create(
+        (title, sub, w, scale), lambda: _rasterize_lower_third(title, sub, w, scale)
+    )
+
+
+def lower_third_origin(w: int, h: int, scale: float = 1.0) -> Tuple[int, int]:
+    pad = _px(CAPTION_PAD, scale)
+    return pad, h - _px(CAPTION_BOX_H, scale) - pad
+
+
+@dataclass(frozen=True)
+class LowerThird:
+    """Lower-third that slides up in the first 0.5s and fades in/out over 0.35s."""
+
+    title: str
+    sub: str = ""
+    seconds: float = 6.0
+    scale: float = 1.0
+
+    def offset(self, t: float) -> int:
+        return int(round((1 - min(max(t, 0.0) / CAPTION_SLIDE_S, 1.0)) * CAPTION_SLIDE_PX * self.scale))
+
+    def opacity(self, t: float) -> float:
+        if t < CAPTION_FADE_S:
+            return max(0.0, t / CAPTION_FADE_S)
+        if t > self.seconds - CAPTION_FADE_S:
+            return max(0.0, (self.seconds - t) / CAPTION_FADE_S)
+        return 1.0
+
+    def draw(self, img: Image.Image, t: float) -> Image.Image:
+        sprite = lower_third_sprite(self.title, self.sub, img.width, self.scale)
+        if sprite is None:
+            return img
+        x, y = lower_third_origin(*img.size, self.scale)
+        return blit(img, sprite, x, y + self.offset(t), self.opacity(t))
+
+
+# -----------------------------
+# Shot effects
+# -----------------------------
+@dataclass(frozen=True)
+class ShotFX:
+    """
+    Per-shot camera move and caption applied to each rendered frame, so a
+    procedural shot is composited and encoded in a single pass.
+    """
+
+    camera: Camera | None = None
+    caption: LowerThird | None = None
+
+    def apply(self, img: Image.Image, t: float) -> Image.Image:
+        if self.camera is not None:
+            img = self.camera.apply(img, t)
+        if self.caption is not None:
+            img = self.caption.draw(img, t)
+        return img
+
+    def motion_speed(self, w: int, h: int) -> float:
+        # The caption's half-second slide-in is left out on purpose: it would
+        # pin every captioned shot to the full frame rate.
+        return self.camera.motion_speed(w, h) if self.camera is not None else 0.0
+
+
+def shot_fx_from_plan(
+    plan: Dict[str, Any],
+    seconds: float,
+    title: str = "",
+    sub: str = "",
+    scale: float = 1.0,
+) -> ShotFX | None:
+    """
+    ShotFX for an animation_json plan ({"type": "kenburns"|"pan"|"static",
+    "intensity": ...}) and a caption already split into title/subline.
+    None when the shot has neither a camera move nor a caption. `scale` is
+    the frame size relative to 1280x720 (draft previews render smaller).
+    """
+    kind = (plan.get("type") or "kenburns").lower()
+    intensity = float(plan.get("intensity", 0.18))
+    camera = None
+    if kind != "static" and intensity > 0:
+        camera = Camera(kind="pan" if kind == "pan" else "kenburns", intensity=intensity, seconds=seconds)
+    caption = LowerThird(title, sub, seconds, scale) if (title or sub) else None
+    if camera is None and caption is None:
+        return None
+    return ShotFX(camera=camera, caption=caption)
@@ -0,0 +1,192 @@
+from __future__ import annotations
+
+import collections
+import queue
+import subprocess
+import threading
+from pathlib import Path
+from typing import Deque, List, Sequence, Tuple
+
+from PIL import Image
+
+from .profiles import get_profile
+
+_PIX_FMTS = {"RGB": "rgb24", "RGBA": "rgba"}
+_STOP = object()
+
+
+# Filters bringing a stream rendered at a lower rate up to the delivery rate.
+RETIME_FILTERS = {
+    "blend": "framerate=fps={fps}",  # crossfade neighbouring frames
+    "duplicate": "fps={fps}",        # repeat frames
+}
+
+
+def retime_args(fps: float, output_fps: float | None, retime: str = "blend") -> Tuple[str, ...]:
+    """ffmpeg output args resampling `fps` input to `output_fps` (none if equal)."""
+    if not output_fps or output_fps == fps:
+        return ()
+    if retime not in RETIME_FILTERS:
+        raise ValueError(f"Unknown retime mode: {retime}")
+    return ("-vf", RETIME_FILTERS[retime].format(fps=output_fps))
+
+
+def keyframe_args(seconds: float | None) -> Tuple[str, ...]:
+    """ffmpeg output args forcing a keyframe every `seconds` (none if unset)."""
+    if not seconds:
+        return ()
+    return ("-force_key_frames", f"expr:gte(t,n_forced*{seconds:g})")
+
+
+class FFmpegSink:
+    """
+    Streams raw frames into ffmpeg's stdin instead of writing an image sequence.
+
+    Frames are queued (bounded, so rendering can run ahead of x264 by at most
+    `queue_size` frames) and written by a background thread. If ffmpeg dies,
+    the next `write()` / `close()` raises `subprocess.CalledProcessError`
+    carrying the tail of ffmpeg's stderr.
+
+        with FFmpegSink(out_mp4, w, h, fps) as sink:
+            for img in frames:
+                sink.write(img)
+    """
+
+    def __init__(
+        self,
+        out_mp4: str,
+        w: int,
+        h: int,
+        fps: float,
+        mode: str = "RGB",
+        output_args: Sequence[str] | None = None,
+        queue_size: int = 8,
+    ):
+        if mode not in _PIX_FMTS:
+            raise ValueError(f"Unsupported frame mode for ffmpeg sink: {mode}")
+        self.out_path = Path(out_mp4)
+        self.size = (w, h)
+        self.mode = mode
+        self.frames = 0
+        self.cmd: List[str] = [
+            "ffmpeg", "-y",
+            "-f", "rawvideo",
+            "-pix_fmt", _PIX_FMTS[mode],
+            "-s", f"{w}x{h}",
+            "-framerate", str(fps),
+            "-i", "-",
+            *(get_profile().x264_args(fps) if output_args is None else output_args),
+            str(self.out_path),
+        ]
+        self._queue: "queue.Queue[object]" = queue.Queue(maxsize=max(1, queue_size))
+        self._stderr: Deque[bytes] = collections.deque(maxlen=200)
+        self._proc: subprocess.Popen | None = None
+        self._writer: threading.Thread | None = None
+        self._reader: threading.Thread | None = None
+        self._write_error: BaseException | None = None
+
+    # -----------------------------
+    # Lifecycle
+    # -----------------------------
+    def open(self) -> "FFmpegSink":
+        self.out_path.parent.mkdir(parents=True, exist_ok=True)
+        self._proc = subprocess.Popen(
+            self.cmd,
+            stdin=subprocess.PIPE,
+            stdout=subprocess.DEVNULL,
+            stderr=subprocess.PIPE,
+        )
+        self._reader = threading.Thread(target=self._drain_stderr, daemon=True)
+        self._reader.start()
+        self._writer = threading.Thread(target=self._pump, daemon=True)
+        self._writer.start()
+        return self
+
+    def __enter__(self) -> "FFmpegSink":
+        return self.open()
+
+    def __exit__(self, exc_type, exc, tb) -> None:
+        if exc_type is None:
+            self.close()
+        else:
+            self.abort()
+
+    def _drain_stderr(self) -> None:
+        assert self._proc is not None and self._proc.stderr is not None
+        for line in self._proc.stderr:
+            self._stderr.append(line)
+
+    def _pump(self) -> None:
+        assert self._proc is not None and self._proc.stdin is not None
+        stdin = self._proc.stdin
+        while True:
+            item = self._queue.get()
+            if item is _STOP:
+                break
+            if self._write_error is not None:
+                continue  # keep draining so producers never block
+            try:
+                stdin.write(item)  # type: ignore[arg-type]
+            except (BrokenPipeError, OSError) as e:
+                self._write_error = e
+        try:
+            stdin.close()
+        except (BrokenPipeError, OSError):
+            pass
+
+    def _failure(self) -> subprocess.CalledProcessError:
+        assert self._proc is not None
+        rc = self._proc.poll()
+        if rc is None:
+            rc = -1
+        stderr = b"".join(self._stderr).decode("utf-8", errors="replace")
+        return subprocess.CalledProcessError(rc, self.cmd, stderr=stderr)
+
+    # -----------------------------
+    # Frames
+    # -----------------------------
+    def write(self, frame: Image.Image | bytes) -> None:
+        if self._proc is None:
+            raise RuntimeError("FFmpegSink.write() called before open()")
+        if self._write_error is not None or self._proc.poll() is not None:
+            self.abort()
+            raise self._failure()
+        if isinstance(frame, Image.Image):
+            if frame.size != self.size:
+                raise ValueError(f"Frame size {frame.size} does not match sink size {self.size}")
+            if frame.mode != self.mode:
+                frame = frame.convert(self.mode)
+            frame = frame.tobytes()
+        self._queue.put(frame)
+        self.frames += 1
+
+    def close(self) -> str:
+        """Flush queued frames, wait for ffmpeg, raise if it failed."""
+        if self._proc is None:
+            raise RuntimeError("FFmpegSink.close() called before open()")
+        self._queue.put(_STOP)
+        assert self._writer is not None and self._reader is not None
+        self._writer.join()
+        rc = self._proc.wait()
+        self._reader.join()
+        if rc != 0 or self._write_error is not None:
+            raise self._failure()
+        return str(self.out_path)
+
+    def abort(self) -> None:
+        """Kill ffmpeg and unblock the writer; used on render errors."""
+        if self._proc is None:
+            return
+        if self._proc.poll() is None:
+            self._proc.kill()
+        self._write_error = self._write_error or BrokenPipeError("sink aborted")
+        # Drop pending frames and wake the writer so it can finish.
+        while True:
+            try:
+                self._queue.get_nowait()
+            except queue.Empty:
+                break
+        self._queue.put(_STOP)
+        if self._writer is not None:
+            self._writer.join(timeout=5)
+        self._proc.wait()
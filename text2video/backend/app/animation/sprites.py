@@ -0,0 +1,203 @@
+from __future__ import annotations
+
+import math
+from dataclasses import dataclass
+from functools import lru_cache
+from typing import Tuple
+
+from PIL import Image, ImageDraw, ImageFilter, ImageFont
+
+from .cache import LRUCache
+
+RGB = Tuple[int, int, int]
+
+# Prefer a clean sans. DejaVuSans is common on many installs.
+FONT_NAMES: Tuple[str, ...] = ("DejaVuSans.ttf", "Arial.ttf", "Calibri.ttf")
+
+
+@dataclass(frozen=True)
+class Sprite:
+    """
+    Tightly cropped RGBA raster. (ox, oy) is the offset of the image's top-left
+    corner from the anchor it was drawn at (e.g. the text origin).
+    """
+
+    image: Image.Image
+    ox: int = 0
+    oy: int = 0
+
+    @property
+    def size(self) -> Tuple[int, int]:
+        return self.image.size
+
+
+# -----------------------------
+# Fonts
+# -----------------------------
+@lru_cache(maxsize=64)
+def load_font(size: int, names: Tuple[str, ...] = FONT_NAMES) -> ImageFont.FreeTypeFont:
+    """First loadable font of `names` at `size`, memoized per (names, size)."""
+    for name in names:
+        try:
+            return ImageFont.truetype(name, size)
+        except Exception:
+            continue
+    return ImageFont.load_default()
+
+
+@lru_cache(maxsize=1024)
+def text_size(text: str, size: int, names: Tuple[str, ...] = FONT_NAMES) -> Tuple[int, int]:
+    # Same box as ImageDraw.textbbox((0, 0), ...)
+    bbox = load_font(size, names).getbbox(text)
+    return (bbox[2] - bbox[0], bbox[3] - bbox[1])
+
+
+# -----------------------------
+# Text sprites
+# -----------------------------
+_text_sprites: LRUCache[Sprite] = LRUCache(maxsize=512)
+
+
+def _rasterize_text(
+    text: str,
+    font: ImageFont.FreeTypeFont,
+    fill_rgb: RGB,
+    shadow_rgb: RGB,
+    shadow_offset: Tuple[int, int],
+    shadow_blur: float,
+    shadow_alpha: int,
+) -> Sprite:
+    l, t, r, b = font.getbbox(text)
+    sx, sy = shadow_offset
+    # Gaussian tails are negligible past ~3 radii; blur only this box.
+    pad = int(math.ceil(shadow_blur * 3)) + 1
+    x0 = min(l, l + sx) - pad
+    y0 = min(t, t + sy) - pad
+    x1 = max(r, r + sx) + pad
+    y1 = max(b, b + sy) + pad
+    size = (max(1, x1 - x0), max(1, y1 - y0))
+
+    shadow = Image.new("RGBA", size, (0, 0, 0, 0))
+    ImageDraw.Draw(shadow).text((sx - x0, sy - y0), text, font=font, fill=tuple(shadow_rgb) + (shadow_alpha,))
+    if shadow_blur > 0:
+        shadow = shadow.filter(ImageFilter.GaussianBlur(shadow_blur))
+
+    glyphs = Image.new("RGBA", size, (0, 0, 0, 0))
+    ImageDraw.Draw(glyphs).text((-x0, -y0), text, font=font, fill=tuple(fill_rgb) + (255,))
+    return Sprite(Image.alpha_composite(shadow, glyphs), x0, y0)
+
+
+def text_sprite(
+    text: str,
+    size: int,
+    fill_rgb: RGB,
+    shadow_rgb: RGB = (0, 0, 0),
+    shadow_offset: Tuple[int, int] = (2, 2),
+    shadow_blur: float = 6,
+    shadow_alpha: int = 140,
+    names: Tuple[str, ...] = FONT_NAMES,
+) -> Sprite:
+    """
+    Text + soft drop shadow rasterized once per (text, font, color, shadow).
+    Typewriter prefixes are just shorter texts and get their own entries.
+    """
+    key = (text, names, size, tuple(fill_rgb), tuple(shadow_rgb), tuple(shadow_offset), shadow_blur, shadow_alpha)
+    return _text_sprites.get_or_create(
+        key,
+        lambda: _rasterize_text(
+            text, load_font(size, names), fill_rgb, shadow_rgb, shadow_offset, shadow_blur, shadow_alpha
+        ),
+    )
+
+
+# -----------------------------
+# Glow shape sprites
+# -----------------------------
+# Growing bars pass through many widths; snapping to an even pixel grid lets
+# neighbouring frames and repeated renders share sprites.
+SHAPE_QUANTUM = 2
+
+_shape_sprites: LRUCache[Sprite] = LRUCache(maxsize=128)
+
+
+def _quantize(v: int) -> int:
+    return max(SHAPE_QUANTUM, int(round(v / SHAPE_QUANTUM)) * SHAPE_QUANTUM)
+
+
+def _rasterize_glow_shape(kind: str, w: int, h: int, color_rgb: RGB, radius: int, glow: int, glow_alpha: int) -> Sprite:
+    pad = int(math.ceil(glow * 3)) + 1
+    size = (w + 2 * pad + 1, h + 2 * pad + 1)
+    bbox = [pad, pad, pad + w, pad + h]
+
+    def _shape(alpha: int) -> Image.Image:
+        layer = Image.new("RGBA", size, (0, 0, 0, 0))
+        d = ImageDraw.Draw(layer)
+        if kind == "circle":
+            d.ellipse(bbox, fill=tuple(color_rgb) + (alpha,))
+        else:
+            d.rounded_rectangle(bbox, radius=radius, fill=tuple(color_rgb) + (alpha,))
+        return layer
+
+    out = _shape(255)
+    if glow_alpha > 0:
+        halo = _shape(glow_alpha)
+        if glow > 0:
+            halo = halo.filter(ImageFilter.GaussianBlur(glow))
+        out = Image.alpha_composite(halo, out)
+    return Sprite(out, -pad, -pad)
+
+
+def glow_shape_sprite(
+    kind: str,
+    w: int,
+    h: int,
+    color_rgb: RGB,
+    radius: int = 16,
+    glow: int = 18,
+    glow_alpha: int = 90,
+) -> Sprite:
+    """Solid shape over its blurred halo, anchored at the shape's top-left."""
+    w, h = _quantize(w), _quantize(h)
+    key = (kind, w, h, tuple(color_rgb), radius, glow, glow_alpha)
+    return _shape_sprites.get_or_create(
+        key, lambda: _rasterize_glow_shape(kind, w, h, color_rgb, radius, glow, glow_alpha)
+    )
+
+
+# -----------------------------
+# Blitting
+# -----------------------------
+def _with_opacity(img: Image.Image, opacity: float) -> Image.Image:
+    a = int(round(255 * opacity))
+    if a >= 255:
+        return img
+    out = img.copy()
+    out.putalpha(img.getchannel("A").point(lambda v: v * a // 255))
+    return out
+
+
+def blit(base: Image.Image, sprite: Sprite, x: int, y: int, opacity: float = 1.0) -> Image.Image:
+    """
+    Alpha-blend `sprite` onto `base` in place with its anchor at (x, y).
+    Works on opaque RGB frames and on transparent RGBA overlays alike;
+    only the sprite's box (clipped to the canvas) is touched.
+    """
+    if opacity <= 0:
+        return base
+    img = sprite.image
+    left, top = x + sprite.ox, y + sprite.oy
+    bw, bh = base.size
+    sx0, sy0 = max(0, -left), max(0, -top)
+    sx1, sy1 = min(img.width, bw - left), min(img.height, bh - top)
+    if sx1 <= sx0 or sy1 <= sy0:
+        return base
+    if (sx0, sy0, sx1, sy1) != (0, 0, img.width, img.height):
+        img = img.crop((sx0, sy0, sx1, sy1))
+    img = _with_opacity(img, opacity)
+    dest = (left + sx0, top + sy0)
+
+    if base.mode == "RGBA":
+        base.alpha_composite(img, dest=dest)
+    else:
+        base.paste(img, dest, img)
+    return base
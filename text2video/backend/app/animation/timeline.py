@@ -0,0 +1,279 @@
+from __future__ import annotations
+
+import math
+from dataclasses import dataclass, replace
+from typing import Callable, List, Optional, Tuple
+
+import numpy as np
+
+from .plan import AnimationPlan, ShapeLayer, TextLayer
+from .sprites import text_size
+
+RGB = Tuple[int, int, int]
+
+# Layer parameters are plain tuples: everything that decides a layer's pixels
+# at time t. Equal parameters => identical pixels, which is what hold-frame
+# detection relies on. None means the layer draws nothing.
+TextParams = Tuple[str, int, int, int, RGB, int]
+ShapeParams = Tuple[str, int, int, int, int, RGB, int, int, int]
+
+
+# -----------------------------
+# Vectorized easing curves
+# -----------------------------
+def _clip01(t: np.ndarray) -> np.ndarray:
+    return np.clip(t, 0.0, 1.0)
+
+
+def ease_in_out_cubic_v(t: np.ndarray) -> np.ndarray:
+    t = _clip01(t)
+    return np.where(t < 0.5, 4 * t * t * t, 1 - np.power(-2 * t + 2, 3) / 2)
+
+
+def ease_out_back_v(t: np.ndarray) -> np.ndarray:
+    t = _clip01(t)
+    c1 = 1.70158
+    c3 = c1 + 1
+    return 1 + c3 * np.power(t - 1, 3) + c1 * np.power(t - 1, 2)
+
+
+def ease_v(t: np.ndarray, kind: str) -> np.ndarray:
+    if kind == "in_out_cubic":
+        return ease_in_out_cubic_v(t)
+    return _clip01(t)
+
+
+def _trunc(a: np.ndarray) -> np.ndarray:
+    # int() semantics (toward zero), as the scalar renderer used
+    return np.trunc(a).astype(np.int32)
+
+
+# -----------------------------
+# Tracks
+# -----------------------------
+@dataclass
+class Track:
+    """
+    One layer's parameters for every sampled time, as NumPy arrays.
+
+    `start`/`settle` bound the animation window: before `start` the layer is
+    hidden (when `hidden_before_start`), after `settle` it never changes.
+    """
+
+    kind: str  # "text" | "shape"
+    start: float
+    settle: float
+    hidden_before_start: bool
+    visible: np.ndarray
+    x: np.ndarray
+    y: np.ndarray
+    w: np.ndarray
+    h: np.ndarray
+    alpha: np.ndarray
+    chars: np.ndarray
+    color: RGB
+    text: str = ""
+    size: int = 0
+    shape: str = "rect"
+    radius: int = 0
+    glow: int = 0
+
+    def params(self, i: int) -> Optional[Tuple]:
+        if not self.visible[i]:
+            return None
+        if self.kind == "text":
+            return (self.text[: int(self.chars[i])], self.size, int(self.x[i]), int(self.y[i]), self.color, int(self.alpha[i]))
+        return (
+            self.shape, int(self.x[i]), int(self.y[i]), int(self.w[i]), int(self.h[i]),
+            self.color, self.radius, self.glow, int(self.alpha[i]),
+        )
+
+
+def _text_track(
+    layer: TextLayer,
+    times: np.ndarray,
+    frame_w: int,
+    auto_center_x: bool = False,
+    max_width: int | None = None,
+) -> Track:
+    n = len(times)
+    p = _clip01((times - layer.start) / max(layer.duration, 1e-6))
+
+    text = layer.text
+    x, y = layer.x, layer.y
+    size = layer.font_size
+
+    if auto_center_x:
+        tw, th = text_size(text, size)
+        if max_width is not None and tw > max_width:
+            # If too wide, shrink a bit (simple but effective)
+            scale = max_width / max(1, tw)
+            size = max(14, int(layer.font_size * scale))
+            tw, th = text_size(text, size)
+        x = (frame_w - tw) // 2
+
+    xs = np.full(n, x, dtype=np.int32)
+    alpha = np.full(n, 255, dtype=np.int32)
+    chars = np.full(n, len(text), dtype=np.int32)
+
+    if layer.appear == "slide_left":
+        xs = _trunc(x - (1 - ease_in_out_cubic_v(p)) * 60)
+        alpha = np.round(255 * p).astype(np.int32)
+    elif layer.appear == "fade":
+        alpha = np.round(255 * p).astype(np.int32)
+    elif layer.appear == "typewriter":
+        # Each prefix is its own cached sprite, shaped once.
+        chars = np.maximum(1, _trunc(len(text) * p))
+
+    zeros = np.zeros(n, dtype=np.int32)
+    return Track(
+        kind="text",
+        start=layer.start,
+        settle=layer.start + max(layer.duration, 1e-6),
+        hidden_before_start=True,
+        visible=p > 0,
+        x=xs,
+        y=np.full(n, y, dtype=np.int32),
+        w=zeros,
+        h=zeros,
+        alpha=alpha,
+        chars=chars,
+        color=tuple(layer.color),
+        text=text,
+        size=size,
+    )
+
+
+def _shape_track(s: ShapeLayer, times: np.ndarray) -> Track:
+    n = len(times)
+    p = ease_v((times - s.start) / max(s.duration, 1e-6), s.ease)
+
+    # add gentle drift for life
+    drift = _trunc(6 * np.sin((times + s.x * 0.001) * 1.6))
+
+    x = np.full(n, s.x, dtype=np.int32)
+    y = s.y + drift
+    w = np.full(n, s.w, dtype=np.int32)
+    h = np.full(n, s.h, dtype=np.int32)
+    glow, glow_alpha = 18, np.full(n, 90, dtype=np.int32)
+
+    if s.anim == "fade":
+        # fade in: glow strength increases with p
+        glow, glow_alpha = 20, _trunc(90 * _clip01(p))
+    elif s.anim == "grow_w":
+        w = _trunc(s.w * ease_out_back_v(p))
+    elif s.anim == "grow_h":
+        h = _trunc(s.h * ease_out_back_v(p))
+    elif s.anim == "slide_up":
+        y = _trunc(s.y + (1 - ease_in_out_cubic_v(p)) * 60) + drift
+
+    return Track(
+        kind="shape",
+        start=s.start,
+        # The drift never stops, so shapes never settle; fade shapes are
+        # visible before they start.
+        settle=math.inf,
+        hidden_before_start=False,
+        visible=(w > 0) & (h > 0),
+        x=x,
+        y=y,
+        w=w,
+        h=h,
+        alpha=glow_alpha,
+        chars=np.zeros(n, dtype=np.int32),
+        color=tuple(s.color),
+        shape=s.kind,
+        radius=18,
+        glow=glow,
+    )
+
+
+def _underline_track(lt: TextLayer, times: np.ndarray, frame_w: int) -> Track:
+    # Animated underline accent (premium touch)
+    # underline timing tracks title appear
+    n = len(times)
+    p = _clip01((times - lt.start) / max(lt.duration, 1e-6))
+
+    tw, th = text_size(lt.text, lt.font_size)
+    w = _trunc(tw * ease_out_back_v(p))
+    return Track(
+        kind="shape",
+        start=lt.start,
+        settle=lt.start + max(lt.duration, 1e-6),
+        hidden_before_start=True,
+        visible=(p > 0) & (w > 0),
+        x=np.full(n, (frame_w - tw) // 2, dtype=np.int32),
+        y=np.full(n, lt.y + th + 16, dtype=np.int32),
+        w=w,
+        h=np.full(n, 10, dtype=np.int32),
+        alpha=np.full(n, 110, dtype=np.int32),
+        chars=np.zeros(n, dtype=np.int32),
+        color=(90, 170, 255),
+        shape="rect",
+        radius=12,
+        glow=14,
+    )
+
+
+# -----------------------------
+# Timeline
+# -----------------------------
+TrackBuilder = Callable[[np.ndarray], Track]
+
+
+def _track_builders(plan: AnimationPlan) -> List[TrackBuilder]:
+    """z-ordered builders: shapes, title, underline, subtitles."""
+    w = plan.width
+
+    # Safe margins
+    margin_x = int(w * 0.08)
+    max_text_width = w - 2 * margin_x
+
+    builders: List[TrackBuilder] = [lambda times, s=s: _shape_track(s, times) for s in plan.shapes]
+
+    # Title (auto-center) + underline
+    if plan.title:
+        lt = plan.title
+        builders.append(lambda times: _text_track(lt, times, w, auto_center_x=True, max_width=max_text_width))
+        builders.append(lambda times: _underline_track(lt, times, w))
+
+    # Subtitles (left aligned within safe margin)
+    for layer in plan.subtitles:
+        # clamp x to margin for consistency
+        tmp = replace(layer, x=max(margin_x, layer.x))
+        builders.append(lambda times, tmp=tmp: _text_track(tmp, times, w, max_width=max_text_width))
+
+    return builders
+
+
+class Timeline:
+    """
+    A plan compiled for a frame grid: one Track per layer, evaluated for all
+    frames at once. Per-frame rendering only indexes these arrays; times off
+    the grid are evaluated on demand with the same vectorized code.
+    """
+
+    def __init__(self, plan: AnimationPlan, total_frames: int | None = None):
+        self.fps = plan.fps
+        self.total_frames = int(plan.seconds * plan.fps) if total_frames is None else int(total_frames)
+        self.times = np.arange(self.total_frames) / plan.fps
+        self._builders = _track_builders(plan)
+        self.tracks: List[Track] = [build(self.times) for build in self._builders]
+
+    def __len__(self) -> int:
+        return len(self.tracks)
+
+    def index(self, t: float) -> int | None:
+        i = int(round(t * self.fps))
+        if 0 <= i < self.total_frames and self.times[i] == t:
+            return i
+        return None
+
+    def params(self, k: int, t: float) -> Optional[Tuple]:
+        i = self.index(t)
+        if i is None:
+            return self._builders[k](np.array([t], dtype=np.float64)).params(0)
+        return self.tracks[k].params(i)
+
+    def frame_params(self, i: int) -> Tuple:
+        return tuple(track.params(i) for track in self.tracks)
@@ -1,12 +1,22 @@
 from __future__ import annotations
 
+import hashlib
 import json
 import re
 import subprocess
 from pathlib import Path
 from typing import Any, Dict, Optional, Tuple
 
+from .animation.profiles import DELIVERY, EncodingProfile, get_profile
 from .config import settings
+from .animation.shot_fx import (
+    CAPTION_FADE_S,
+    CAPTION_SLIDE_PX,
+    CAPTION_SLIDE_S,
+    lower_third_origin,
+    lower_third_sprite,
+)
+from .storage import caption_cache_dir
 
 
 def _run(cmd: list[str]) -> None:
@@ -78,23 +88,56 @@ def _extract_title_sub(prompt: str) -> Tuple[str, str]:
     return (title, sub)
 
 
-# --- SAFE text escaping for ffmpeg drawtext ---
-def _escape_drawtext_text(s: str) -> str:
+def _even(v: float) -> int:
+    return max(2, int(v) // 2 * 2)
+
+
+def caption_overlay_png(title: str, sub: str, width: int) -> str | None:
     """
-    Escape text for ffmpeg drawtext.
-    - Escape backslashes first
-    - Escape single quotes because we wrap text='...'
-    - Escape colon because ffmpeg uses it as key/value separator
-    - Escape comma because ffmpeg uses it to separate filters
+    Lower-third (box + title + subline) rendered once with Pillow and cached
+    as a PNG keyed by caption text and frame width. None if there is no text.
     """
-    if s is None:
+    if not title and not sub:
+        return None
+    key = hashlib.sha1(f"{width}\n{title}\n{sub}".encode("utf-8")).hexdigest()[:20]
+    png = caption_cache_dir() / f"lower_third_{key}.png"
+    if not png.exists():
+        sprite = lower_third_sprite(title, sub, width)
+        tmp = png.with_suffix(".tmp.png")
+        sprite.image.save(tmp)
+        tmp.replace(png)
+    return str(png)
+
+
+# "burn": captions are drawn into the shot as a lower-third;
+# "soft": they are left out of the pixels and render_project emits a subtitle track
+CAPTION_MODES = ("burn", "soft")
+
+
+def caption_mode(mode: str | None = None) -> str:
+    """Validated caption mode; None means settings.caption_mode."""
+    name = (mode or settings.caption_mode).strip().lower()
+    if name not in CAPTION_MODES:
+        raise ValueError(f"Unknown caption mode: {mode} (expected one of {', '.join(CAPTION_MODES)})")
+    return name
+
+
+def caption_lines(plan: Dict[str, Any], prompt_for_text: str = "") -> Tuple[str, str]:
+    """
+    (title, subline) shown in a shot's lower-third; empty if the plan turns
+    text off, or carries it as a soft subtitle ("text": "soft").
+    """
+    if plan.get("text") in (False, "off", "none", "soft"):
+        return ("", "")
+    # Prioritize the explicitly stored educational caption over the visual generation prompt
+    return _extract_title_sub(plan.get("caption") or prompt_for_text)
+
+
+def caption_text(plan: Dict[str, Any], prompt_for_text: str = "") -> str:
+    """A shot's full caption for the subtitle track; empty if the plan turns text off."""
+    if plan.get("text") in (False, "off", "none"):
         return ""
-    s = str(s)
-    s = s.replace("\\", "\\\\")
-    s = s.replace("'", "\\'")
-    s = s.replace(":", "\\:")
-    s = s.replace(",", "\\,")
-    return s
+    return re.sub(r"\s+", " ", plan.get("caption") or prompt_for_text or "").strip()
 
 
 def apply_animations_ffmpeg(
@@ -103,105 +146,88 @@ def apply_animations_ffmpeg(
     duration_s: int,
     plan: Dict[str, Any],
     prompt_for_text: str = "",
+    profile: str | EncodingProfile | None = None,
+    tune: str | None = None,
 ) -> None:
     """
-    Apply:
+    Apply to an externally produced clip (WAN2, test pattern):
     - motion (zoom/pan)
     - text overlay (animated lower-third)
+
+    The output meets the delivery contract (profiles.DELIVERY): the input is
+    scaled to cover the delivery size and center-cropped first (WAN2 clips
+    are 1280x704), frames are resampled to the delivery rate whatever the
+    plan's "fps", and audio is dropped.
+
+    The lower-third is a pre-rendered RGBA sprite composited with `overlay`
+    (alpha fade + slide-up expression), so ffmpeg does no font lookup or text
+    shaping per frame. Procedural shots get the same effects in-process
+    (see animation/shot_fx.py).
+    Encoded with `profile` (see animation/profiles.py); `tune` overrides its
+    content tune, e.g. "film" for photoreal clips.
     """
     inp = Path(input_mp4)
     out = Path(output_mp4)
     out.parent.mkdir(parents=True, exist_ok=True)
 
-    fps = int(plan.get("fps", 30))
+    fps = DELIVERY.fps
     dur = max(1, int(duration_s))
     motion_type = (plan.get("type") or "kenburns").lower()
     intensity = float(plan.get("intensity", 0.18))
+    w, h = DELIVERY.width, DELIVERY.height
+    cover = (
+        f"trim=duration={dur},setpts=PTS-STARTPTS,"
+        f"scale={w}:{h}:force_original_aspect_ratio=increase,crop={w}:{h},setsar=1"
+    )
 
     # ----- Motion filter -----
-    if motion_type == "kenburns":
-        # zoom from 1 -> 1+intensity across duration
+    if motion_type == "static" or intensity <= 0:
+        vf_motion = f"{cover},fps={fps}"
+    elif motion_type == "kenburns":
+        # zoom from 1 -> 1+intensity across duration (oversampled for smooth motion)
         vf_motion = (
-            f"trim=duration={dur},setpts=PTS-STARTPTS,"
-            f"scale=iw*1.35:ih*1.35,"
+            f"{cover},"
+            f"scale={_even(w*1.35)}:{_even(h*1.35)},"
             f"zoompan=z='1+{intensity}*on/({dur}*{fps})':"
-            f"x='(iw-iw/zoom)/2':y='(ih-ih/zoom)/2':d=1:s=iwxih:fps={fps}"
+            f"x='(iw-iw/zoom)/2':y='(ih-ih/zoom)/2':d=1:s={w}x{h}:fps={fps}"
         )
     else:
-        # pan to the right
+        # pan to the right through a 1/1.2 window
         pan_px = intensity  # use intensity as fraction of width
+        sw, sh = _even(w * 1.20), _even(h * 1.20)
         vf_motion = (
-            f"trim=duration={dur},setpts=PTS-STARTPTS,"
-            f"scale=iw*1.20:ih*1.20,"
-            f"crop=iw:ih:x='(iw*{pan_px})*t/{dur}':y='0',fps={fps}"
+            f"{cover},"
+            f"scale={sw}:{sh},"
+            f"crop={w}:{h}:x='min({sw - w},{sw}*{pan_px}*t/{dur})':y='{(sh - h) // 2}',fps={fps}"
         )
 
-    # ----- Text overlay filter -----
-    # Prioritize the explicitly stored educational caption over the visual generation prompt
-    display_text = plan.get("caption") or prompt_for_text
-    title, sub = _extract_title_sub(display_text)
-    fontfile = settings.font_path.replace("\\", "/")
-
-    safe_title = _escape_drawtext_text(title)
-    safe_sub = _escape_drawtext_text(sub)
-
-    # lower-third box position
-    # animate slide-up in first 0.5s and fade out last 0.5s
-    # y(t) from h to h-160, and alpha fades in/out
-    box_h = 160
-    pad = 28
-    box_y_expr = f"h-{box_h}-({pad}) + (1 - min(t/0.5\\,1))*50"  # slides up 50px
-    alpha_expr = f"if(lt(t\\,0.35)\\, t/0.35\\, if(gt(t\\,{dur}-0.35)\\, ({dur}-t)/0.35\\, 1))"
-
-    draw_title = (
-        f"drawtext=fontfile='{fontfile}':"
-        f"text='{safe_title}':"
-        f"fontsize=44:"
-        f"fontcolor=white@{alpha_expr}:"
-        f"x={pad+22}:"
-        f"y=({box_y_expr})+20:"
-        f"shadowcolor=black@0.55:"
-        f"shadowx=2:"
-        f"shadowy=2"
-    )
-
-    draw_sub = (
-        f"drawtext=fontfile='{fontfile}':"
-        f"text='{safe_sub}':"
-        f"fontsize=28:"
-        f"fontcolor=white@{alpha_expr}:"
-        f"x={pad+22}:"
-        f"y=({box_y_expr})+78:"
-        f"shadowcolor=black@0.45:"
-        f"shadowx=2:"
-        f"shadowy=2"
-    )
-
-    # Use a semi-transparent box + two lines of text
-    vf_text = (
-        f"drawbox=x={pad}:y=h-{box_h}-{pad}:w=w-{pad*2}:h={box_h}:color=black@0.45:t=fill,"
-        f"{draw_title},"
-        f"{draw_sub}"
-    )
-
-    # Combine all
-    vf = f"{vf_motion},{vf_text},format=yuv420p"
+    # ----- Text overlay (pre-rendered sprite) -----
+    title, sub = caption_lines(plan, prompt_for_text)
+    caption_png = caption_overlay_png(title, sub, w)
+
+    cmd = ["ffmpeg", "-y", "-i", str(inp)]
+    if caption_png:
+        # lower-third slides up 50px in the first 0.5s and fades in/out over 0.35s
+        x, y = lower_third_origin(w, h)
+        fade_out = max(0.0, dur - CAPTION_FADE_S)
+        graph = (
+            f"[0:v]{vf_motion}[bg];"
+            f"[1:v]format=rgba,"
+            f"fade=t=in:st=0:d={CAPTION_FADE_S}:alpha=1,"
+            f"fade=t=out:st={fade_out}:d={CAPTION_FADE_S}:alpha=1[cap];"
+            f"[bg][cap]overlay=x={x}:"
+            f"y='{y}+(1-min(t/{CAPTION_SLIDE_S},1))*{CAPTION_SLIDE_PX}':"
+            f"shortest=1,format=yuv420p[v]"
+        )
+        cmd += ["-loop", "1", "-framerate", str(fps), "-i", caption_png, "-filter_complex", graph, "-map", "[v]"]
+    else:
+        cmd += ["-vf", f"{vf_motion},format=yuv420p"]
 
-    cmd = [
-        "ffmpeg",
-        "-y",
-        "-i",
-        str(inp),
-        "-vf",
-        vf,
+    cmd += [
+        "-an",
         "-t",
         str(dur),
-        "-c:v",
-        "libx264",
-        "-pix_fmt",
-        "yuv420p",
-        "-movflags",
-        "+faststart",
+        *get_profile(profile).x264_args(fps, tune=tune),
         str(out),
     ]
     _run(cmd)
@@ -26,6 +26,23 @@ class Settings(BaseSettings):
     # NEW: Windows font path for text rendering
     font_path: str = r"C:\Windows\Fonts\segoeui.ttf"
 
+    # Default x264 quality tier for final shots (standard | archival; draft is
+    # previews only, see animation/profiles.py)
+    encoding_profile: str = "standard"
+
+    # Shot captions: "burn" (lower-third in the pixels) or "soft" (subtitle track)
+    caption_mode: str = "burn"
+    subtitle_language: str = "eng"
+
+    # Transition into each shot unless its plan sets one (cut | crossfade | dip)
+    transition: str = "cut"
+    transition_seconds: float = 0.5
+
+    # Content-addressed cache of rendered procedural clips (assets/_cache/renders)
+    render_cache_max_mb: int = 2048
+    # Draft previews have their own (assets/_cache/drafts), so they never evict final clips
+    draft_cache_max_mb: int = 512
+
     model_config = SettingsConfigDict(env_file=str(ENV_PATH), extra="ignore")
 
     def __init__(self, **kwargs):
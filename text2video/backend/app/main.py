@@ -1,11 +1,12 @@
-from fastapi import FastAPI, APIRouter
+from fastapi import FastAPI, APIRouter, HTTPException
 from fastapi.middleware.cors import CORSMiddleware
 from pydantic import BaseModel
 
-from .db import Base, engine
+from .db import Base, engine, ensure_columns
 from .routes.media import router as media_router
 from .routes.projects import router as projects_router
 from .routes.studio import router as studio_router
+from .storage import draft_cache, render_cache
 
 app = FastAPI(title="Text2Video MVP")
 
@@ -27,24 +28,37 @@ animate_router = APIRouter()
 
 class AnimateReq(BaseModel):
     text: str
+    profile: str | None = None  # draft | standard | archival (default: settings.encoding_profile)
 
 
 @animate_router.post("/animate")
 def animate(req: AnimateReq):
     # Lazy imports so the app doesn't fail to start if these modules aren't present yet.
+    from .animation.clip_cache import clip_key
     from .animation.compiler import text_to_plan
     from .animation.encode import render_to_mp4
     from .storage_paths import project_file_path  # adjust if your helper name differs
 
+    from .animation.profiles import get_profile
+
+    try:
+        profile = get_profile(req.profile)
+    except ValueError as e:
+        raise HTTPException(400, str(e))
     plan = text_to_plan(req.text)
     out_mp4 = project_file_path("adhoc", "animation.mp4")  # replace with your path helper
-    render_to_mp4(plan, out_mp4)
-    return {"mp4_path": out_mp4}
+    _, hit = render_cache().render(
+        clip_key("plan", plan, profile=profile),
+        out_mp4,
+        lambda dest: render_to_mp4(plan, dest, profile=profile),
+    )
+    return {"mp4_path": out_mp4, "encoding_profile": profile.name, "render_cache": "hit" if hit else "miss"}
 
 
 @app.on_event("startup")
 def startup() -> None:
     Base.metadata.create_all(bind=engine)
+    ensure_columns()
 
 
 app.include_router(animate_router)
@@ -56,3 +70,10 @@ app.include_router(media_router)
 @app.get("/")
 def health():
     return {"ok": True, "service": "text2video-backend"}
+
+
+@app.get("/cache/stats")
+def cache_stats():
+    # Entries and bytes are the shared stores'; hits/misses count this API
+    # process only (workers report theirs per shot as "render_cache_counts").
+    return {"renders": render_cache().stats(), "drafts": draft_cache().stats()}
@@ -1,7 +1,7 @@
 import enum
 from datetime import datetime
 
-from sqlalchemy import String, Text, DateTime, Enum, Integer, ForeignKey
+from sqlalchemy import String, Text, DateTime, Enum, Integer, Float, ForeignKey
 from sqlalchemy.orm import Mapped, mapped_column, relationship
 
 from .db import Base
@@ -21,6 +21,12 @@ class Project(Base):
     title: Mapped[str] = mapped_column(String(200))
     created_at: Mapped[datetime] = mapped_column(DateTime, default=datetime.utcnow)
 
+    # x264 quality tier for the project's shots (animation/profiles.py);
+    # None -> settings.encoding_profile
+    encoding_profile: Mapped[str | None] = mapped_column(String(20), nullable=True)
+    # "burn" | "soft" (animations.CAPTION_MODES); None -> settings.caption_mode
+    caption_mode: Mapped[str | None] = mapped_column(String(10), nullable=True)
+
     chapter: Mapped["Chapter"] = relationship(
         back_populates="project",
         uselist=False,
@@ -81,6 +87,21 @@ class Shot(Base):
     )
     asset_path: Mapped[str | None] = mapped_column(String(400), nullable=True)
 
+    # ffprobe metadata of asset_path, recorded when the shot is generated
+    # (app/probe.py); render_project checks concat compatibility from these.
+    asset_duration_s: Mapped[float | None] = mapped_column(Float, nullable=True)
+    asset_width: Mapped[int | None] = mapped_column(Integer, nullable=True)
+    asset_height: Mapped[int | None] = mapped_column(Integer, nullable=True)
+    asset_fps: Mapped[str | None] = mapped_column(String(20), nullable=True)
+    asset_time_base: Mapped[str | None] = mapped_column(String(20), nullable=True)
+    asset_pix_fmt: Mapped[str | None] = mapped_column(String(20), nullable=True)
+    asset_codec: Mapped[str | None] = mapped_column(String(60), nullable=True)
+    asset_sha256: Mapped[str | None] = mapped_column(String(64), nullable=True)
+    asset_keyframes: Mapped[str | None] = mapped_column(Text, nullable=True)  # JSON list of seconds
+    # caption mode asset_path was rendered with: "burn" (caption in the
+    # pixels) or "soft" (left to render_project's subtitle track)
+    caption_mode: Mapped[str | None] = mapped_column(String(10), nullable=True)
+
     # ✅ stores ffmpeg-based animation instructions as JSON string
     animation_json: Mapped[str | None] = mapped_column(Text, nullable=True)
 
@@ -95,4 +116,9 @@ class Render(Base):
     id: Mapped[int] = mapped_column(Integer, primary_key=True)
     project_id: Mapped[int] = mapped_column(ForeignKey("projects.id"))
     output_path: Mapped[str] = mapped_column(String(400))
+    # sha256 of the ordered shot asset hashes + narration (renderer._render_hash);
+    # None when shots were picked up from disk without stored hashes
+    input_hash: Mapped[str | None] = mapped_column(String(64), nullable=True)
+    # the same without the subtitle track: equal hashes mean only captions changed
+    video_hash: Mapped[str | None] = mapped_column(String(64), nullable=True)
     created_at: Mapped[datetime] = mapped_column(DateTime, default=datetime.utcnow)
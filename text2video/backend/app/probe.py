@@ -0,0 +1,191 @@
+from __future__ import annotations
+
+import hashlib
+import json
+import subprocess
+from dataclasses import dataclass
+from pathlib import Path
+from typing import TYPE_CHECKING, List, Tuple
+
+from .animation.profiles import DEFAULT_PROFILE, DELIVERY, DeliveryFormat, EncodingProfile, get_profile
+
+if TYPE_CHECKING:
+    from .models import Shot
+
+
+@dataclass(frozen=True)
+class ClipInfo:
+    """ffprobe metadata of an encoded shot, as stored on Shot.asset_*."""
+
+    duration_s: float
+    width: int
+    height: int
+    fps: str        # r_frame_rate, e.g. "30/1"
+    time_base: str  # stream time base, e.g. "1/15360"
+    pix_fmt: str
+    codec: str      # "h264 High 4.0"
+    sha256: str
+    # keyframe timestamps in seconds: where the clip can be cut by stream copy
+    keyframes: Tuple[float, ...] = ()
+
+    @property
+    def codec_name(self) -> str:
+        return self.codec.split(" ", 1)[0]
+
+    @property
+    def codec_profile(self) -> str:
+        # everything between the codec name and the level ("Constrained Baseline")
+        parts = self.codec.split(" ")[1:]
+        if parts and parts[-1] == self.codec_level:
+            parts = parts[:-1]
+        return " ".join(parts)
+
+    @property
+    def codec_level(self) -> str:
+        last = self.codec.rsplit(" ", 1)[-1]
+        return last if " " in self.codec and last.replace(".", "", 1).isdigit() else ""
+
+    def mismatches(self, fmt: DeliveryFormat = DELIVERY) -> List[str]:
+        """Ways this clip breaks the output contract (empty if it meets it)."""
+        problems = []
+        if (self.width, self.height) != (fmt.width, fmt.height):
+            problems.append(f"size {self.width}x{self.height} != {fmt.width}x{fmt.height}")
+        if self.fps != fmt.frame_rate:
+            problems.append(f"fps {self.fps} != {fmt.frame_rate}")
+        if self.time_base != fmt.time_base:
+            problems.append(f"time base {self.time_base} != {fmt.time_base}")
+        if self.pix_fmt != fmt.pix_fmt:
+            problems.append(f"pix_fmt {self.pix_fmt} != {fmt.pix_fmt}")
+        if self.codec_name != fmt.codec:
+            problems.append(f"codec {self.codec_name} != {fmt.codec}")
+        elif (self.codec_profile, self.codec_level) != (fmt.profile, fmt.level):
+            got = " ".join(filter(None, (self.codec_profile, self.codec_level))) or "unknown"
+            problems.append(f"profile {got} != {fmt.profile} {fmt.level}")
+        return problems
+
+
+def clip_info_of(shot: "Shot") -> ClipInfo | None:
+    """Metadata stored on a shot, or None if it was never (fully) recorded."""
+    if not shot.asset_sha256 or shot.asset_keyframes is None:
+        return None
+    return ClipInfo(
+        duration_s=shot.asset_duration_s or 0.0,
+        width=shot.asset_width or 0,
+        height=shot.asset_height or 0,
+        fps=shot.asset_fps or "",
+        time_base=shot.asset_time_base or "",
+        pix_fmt=shot.asset_pix_fmt or "",
+        codec=shot.asset_codec or "",
+        sha256=shot.asset_sha256,
+        keyframes=tuple(json.loads(shot.asset_keyframes)),
+    )
+
+
+def clip_info_from_dict(data: dict) -> ClipInfo:
+    """ClipInfo from its asdict() form (e.g. render cache metadata)."""
+    return ClipInfo(**{**data, "keyframes": tuple(data.get("keyframes") or ())})
+
+
+def store_clip_info(shot: "Shot", info: ClipInfo | None) -> None:
+    """Record `info` on the shot's asset_* columns (None clears them)."""
+    shot.asset_duration_s = info.duration_s if info else None
+    shot.asset_width = info.width if info else None
+    shot.asset_height = info.height if info else None
+    shot.asset_fps = info.fps if info else None
+    shot.asset_time_base = info.time_base if info else None
+    shot.asset_pix_fmt = info.pix_fmt if info else None
+    shot.asset_codec = info.codec if info else None
+    shot.asset_sha256 = info.sha256 if info else None
+    shot.asset_keyframes = json.dumps(list(info.keyframes)) if info else None
+
+
+def file_sha256(path: str | Path) -> str:
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            h.update(block)
+    return h.hexdigest()
+
+
+def _level(raw) -> str:
+    # ffprobe reports H.264 levels x10 (40 -> "4.0")
+    try:
+        return f"{int(raw) / 10:.1f}"
+    except (TypeError, ValueError):
+        return ""
+
+
+def probe_clip(path: str | Path) -> ClipInfo:
+    """
+    One ffprobe call for the first video stream (packet headers only, no
+    decoding, for the keyframe list), plus a content hash.
+    """
+    out = subprocess.run(
+        [
+            "ffprobe", "-v", "error",
+            "-select_streams", "v:0",
+            "-show_entries",
+            "stream=codec_name,profile,level,width,height,pix_fmt,r_frame_rate,time_base"
+            ":format=duration:packet=pts_time,flags",
+            "-of", "json",
+            str(path),
+        ],
+        check=True, capture_output=True, text=True,
+    ).stdout
+    data = json.loads(out or "{}")
+    streams = data.get("streams") or []
+    if not streams:
+        raise ValueError(f"No video stream in {path}")
+    st = streams[0]
+    codec = " ".join(
+        part for part in (st.get("codec_name", ""), st.get("profile", ""), _level(st.get("level"))) if part
+    )
+    return ClipInfo(
+        duration_s=round(float((data.get("format") or {}).get("duration") or 0.0), 3),
+        width=int(st.get("width") or 0),
+        height=int(st.get("height") or 0),
+        fps=st.get("r_frame_rate", ""),
+        time_base=st.get("time_base", ""),
+        pix_fmt=st.get("pix_fmt", ""),
+        codec=codec,
+        sha256=file_sha256(path),
+        keyframes=tuple(sorted(
+            round(float(pk["pts_time"]), 3)
+            for pk in data.get("packets") or []
+            if pk.get("flags", "").startswith("K") and pk.get("pts_time") not in (None, "N/A")
+        )),
+    )
+
+
+def conform_clip(
+    src: str,
+    out_mp4: str,
+    profile: str | EncodingProfile | None = None,
+    fmt: DeliveryFormat = DELIVERY,
+) -> str:
+    """
+    Re-encode a clip that breaks the output contract (e.g. a raw 1280x704
+    WAN2 clip): scaled to cover the delivery size and center-cropped,
+    resampled to the delivery rate. Shots carry no audio (narration is
+    muxed over the joined film), so any audio track is dropped. The draft
+    tier cannot meet the contract (see DeliveryFormat.profile): conforming
+    with it uses the default tier instead.
+    """
+    profile = get_profile(profile)
+    if profile.name == "draft":
+        profile = get_profile(DEFAULT_PROFILE)
+    Path(out_mp4).parent.mkdir(parents=True, exist_ok=True)
+    vf = (
+        f"scale={fmt.width}:{fmt.height}:force_original_aspect_ratio=increase,"
+        f"crop={fmt.width}:{fmt.height},fps={fmt.fps},setsar=1"
+    )
+    cmd = [
+        "ffmpeg", "-y",
+        "-i", str(src),
+        "-vf", vf,
+        "-map", "0:v:0", "-an",
+        *profile.x264_args(fmt.fps),
+        str(out_mp4),
+    ]
+    subprocess.run(cmd, check=True, capture_output=True, text=True)
+    return str(out_mp4)
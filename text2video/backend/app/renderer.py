@@ -1,8 +1,11 @@
 from __future__ import annotations
 
-from dataclasses import dataclass
+from dataclasses import dataclass, field
 from pathlib import Path
-from typing import List, Tuple
+from typing import Dict, List, Tuple
+import hashlib
+import json
+import os
 import re
 import subprocess
 
@@ -10,12 +13,24 @@ from sqlalchemy import select
 from sqlalchemy.orm import Session
 
 from .config import settings
-from .models import Scene, Shot
+from .models import Project, Render, Scene, Shot
+from .animation.profiles import get_profile
+from .animations import caption_mode, caption_text, parse_plan
+from .probe import clip_info_of, conform_clip, probe_clip, store_clip_info
+from .storage import preview_project_dir, preview_shot_path
+from .subtitles import Cue, cues_from_shots, mux_subtitles, write_webvtt
+from .transitions import ShotClip, build_pieces, dropped_transitions, plan_pieces, shot_starts, transition_from_plan
 
 
 @dataclass
 class RenderResult:
     output_path: str
+    # True when nothing changed since the last render and its output was returned as is
+    reused: bool = False
+    # sidecar WebVTT of the soft subtitle track, if the project has one
+    subtitles_path: str | None = None
+    # ids of shots whose transition in was played as a hard cut (no keyframe to cut at)
+    dropped_transitions: List[int] = field(default_factory=list)
 
 
 def _project_dir(project_id: int) -> Path:
@@ -74,8 +89,121 @@ def _sort_key_from_path(p: Path) -> Tuple[int, int, str]:
     return (s, sh, p.name)
 
 
-def render_project(project_id: int, db: Session) -> RenderResult:
-    out_dir = _project_dir(project_id)
+def _ensure_concat_safe(shot: Shot, path: Path, profile: str | None) -> None:
+    """
+    Check a shot against the output contract from its stored metadata (no
+    ffprobe). Shots generated before metadata was recorded are probed once
+    and backfilled; a shot that breaks the contract is conformed on its own,
+    so the join itself stays a stream copy.
+    """
+    info = clip_info_of(shot)
+    if info is None:
+        info = probe_clip(path)
+        store_clip_info(shot, info)
+    if info.mismatches():
+        tmp = path.with_suffix(".conform.mp4")
+        conform_clip(str(path), str(tmp), profile or settings.encoding_profile)
+        os.replace(tmp, path)
+        store_clip_info(shot, probe_clip(path))
+
+
+def _digest(obj) -> str:
+    blob = json.dumps(obj, sort_keys=True, separators=(",", ":"))
+    return hashlib.sha256(blob.encode("utf-8")).hexdigest()
+
+
+def _render_hash(keys: List[Tuple[int, str]], narration: Path) -> str:
+    """
+    Identity of a final render: the ordered (scene, piece key) list (shot
+    asset sha256s, plus cut points and settings around transitions) and the
+    narration file, by size and mtime (hashing a lecture's worth of WAV on
+    every request would cost more than the check saves).
+    """
+    audio = None
+    if narration.exists():
+        st = narration.stat()
+        audio = [st.st_size, st.st_mtime_ns]
+    return _digest({"shots": [[scene, key] for scene, key in keys], "narration": audio})
+
+
+def _scene_segments(project_dir: Path, entries: List[Tuple[int, str, str]]) -> List[str]:
+    """
+    One intermediate per scene, the stream-copy join of its (scene, path,
+    key) pieces, named by the hash of their keys: after a shot changes only
+    its own scene is re-joined. Single-piece scenes use the piece as is.
+    Segments no longer in use are removed.
+    """
+    seg_dir = project_dir / "_scenes"
+    seg_dir.mkdir(parents=True, exist_ok=True)
+    scenes: Dict[int, List[Tuple[str, str]]] = {}
+    for scene, path, key in entries:
+        scenes.setdefault(scene, []).append((path, key))
+
+    segments: List[str] = []
+    keep = set()
+    for scene, shots in scenes.items():
+        if len(shots) == 1:
+            segments.append(shots[0][0])
+            continue
+        seg = seg_dir / f"scene_{scene}.{_digest([sha for _, sha in shots])[:16]}.mp4"
+        if not seg.exists():
+            tmp = seg.with_name(f".{seg.name}")
+            _concat_videos_ffmpeg([path for path, _ in shots], str(tmp))
+            os.replace(tmp, seg)
+        keep.add(seg.name)
+        segments.append(str(seg))
+
+    for p in seg_dir.iterdir():
+        if p.name not in keep:
+            p.unlink(missing_ok=True)
+    return segments
+
+
+def _subtitles(mp4: Path, cues: List[Cue], replace: bool) -> str | None:
+    """
+    Write the cues as `final_render.vtt` next to `mp4` and carry them in it
+    as a mov_text track (stream copy). Without cues the sidecar is removed,
+    and with `replace` an existing track is dropped.
+    """
+    vtt = mp4.with_name("final_render.vtt")
+    if not cues:
+        vtt.unlink(missing_ok=True)
+        if replace:
+            mux_subtitles(mp4, None)
+        return None
+    write_webvtt(cues, vtt)
+    mux_subtitles(mp4, vtt)
+    return str(vtt)
+
+
+def render_project(project_id: int, db: Session, draft: bool = False) -> RenderResult:
+    """
+    Concatenate the project's shots (+ narration) into final_render*.mp4.
+    With `draft`, the shots' draft previews are joined instead, inside the
+    preview tree; final renders and shot assets are left untouched.
+    Final renders check every shot against the output contract from the
+    metadata stored on it (see _ensure_concat_safe) before joining by copy.
+
+    Final renders are incremental: each is recorded in Render with a hash of
+    its inputs, a request whose inputs match the latest render returns that
+    output untouched, and shots are joined per scene first (_scene_segments)
+    so a changed shot only re-joins its scene plus the cheap top-level concat.
+
+    Transitions (a shot plan's "transition", else settings.transition) are
+    smart-rendered: only the frames between the keyframes around each cut
+    are re-encoded, shot interiors are stream-copied (see transitions.py).
+    Transitions with no keyframe to cut at are played as hard cuts and
+    listed in RenderResult.dropped_transitions.
+
+    Shots rendered in "soft" caption mode (Shot.caption_mode, so a project
+    switched to another mode stays right until its shots are re-generated)
+    get their caption on a subtitle track (mov_text, plus a final_render.vtt
+    sidecar) from their start in the film. The track is outside the render's video hash: when only captions
+    changed, the track is rebuilt and remuxed onto the previous output.
+    """
+    project_dir = _project_dir(project_id)
+    project = db.get(Project, project_id)
+    out_dir = preview_project_dir(project_id) if draft else project_dir
 
     # 1) Normal path: use DB asset_path if present and files exist
     shots = db.execute(
@@ -85,15 +213,45 @@ def render_project(project_id: int, db: Session) -> RenderResult:
         .order_by(Scene.idx.asc(), Shot.idx.asc())
     ).scalars().all()
 
+    mode = caption_mode(getattr(project, "caption_mode", None))
     mp4_paths: List[str] = []
+    clips: List[ShotClip] = []
+    clip_shots: List[int] = []  # shot id per clip
+    captions: List[str] = []  # per joined shot, only for captions not burned into it
+    draft_seconds: List[float] = []
     for sh in shots:
+        # drafts are rendered in the current mode; shot assets in the one they record
+        soft = (mode if draft else (sh.caption_mode or mode)) == "soft"
+        caption = caption_text(parse_plan(sh.animation_json), sh.prompt or "") if soft else ""
+        if draft:
+            p = Path(preview_shot_path(project_id, sh.scene.idx, sh.idx))
+            if p.exists():
+                mp4_paths.append(str(p))
+                captions.append(caption)
+                draft_seconds.append(float(max(1, int(sh.duration_s or 6))))
+            continue
         if not sh.asset_path:
             continue
         p = Path(sh.asset_path)
         if not p.is_absolute():
             p = (Path.cwd() / p).resolve()
         if p.exists() and p.suffix.lower() == ".mp4":
+            _ensure_concat_safe(sh, p, getattr(project, "encoding_profile", None))
             mp4_paths.append(str(p))
+            captions.append(caption)
+            info = clip_info_of(sh)
+            clip_shots.append(sh.id)
+            clips.append(ShotClip(
+                scene=sh.scene.idx,
+                path=str(p),
+                sha256=info.sha256,
+                duration_s=info.duration_s,
+                keyframes=info.keyframes,
+                transition_in=transition_from_plan(
+                    parse_plan(sh.animation_json), settings.transition, settings.transition_seconds
+                ) if clips else None,
+            ))
+    db.commit()
 
     # 2) Fallback: scan filesystem for shot mp4s and prefer non-base over base
     if not mp4_paths:
@@ -128,13 +286,62 @@ def render_project(project_id: int, db: Session) -> RenderResult:
     if not mp4_paths:
         raise ValueError("No MP4 shots found on disk to render")
 
+    narration = project_dir / "narration.wav"
+    input_hash = video_hash = pieces = None
+    dropped: List[int] = []
+    starts: List[float] = []
+    total = 0.0
+    if not draft and len(clips) == len(mp4_paths):
+        profile = get_profile(getattr(project, "encoding_profile", None) or settings.encoding_profile)
+        pieces = plan_pieces(clips, profile)
+        dropped = [clip_shots[i] for i in dropped_transitions(clips, pieces)]
+        video_hash = _render_hash([(pc.scene, pc.key) for pc in pieces], narration)
+        starts, total = shot_starts(pieces, len(clips))
+    elif draft:
+        for seconds in draft_seconds:
+            starts.append(total)
+            total += seconds
+    cues = cues_from_shots(list(zip(starts, captions)), total) if len(starts) == len(captions) else []
+
+    if video_hash is not None:
+        input_hash = _digest([video_hash, [[c.start, c.end, c.text] for c in cues]])
+        # final_render*.mp4 is overwritten by each render: only the latest one can be reused
+        last = db.execute(
+            select(Render).where(Render.project_id == project_id).order_by(Render.id.desc()).limit(1)
+        ).scalars().first()
+        if last is not None and Path(last.output_path).exists():
+            vtt = Path(last.output_path).with_name("final_render.vtt")
+            if last.input_hash == input_hash:
+                return RenderResult(
+                    output_path=last.output_path, reused=True, subtitles_path=str(vtt) if cues else None,
+                    dropped_transitions=dropped,
+                )
+            if last.video_hash == video_hash:
+                # only captions changed: new track, remuxed by stream copy
+                subtitles_path = _subtitles(Path(last.output_path), cues, replace=True)
+                db.add(Render(
+                    project_id=project_id, output_path=last.output_path,
+                    input_hash=input_hash, video_hash=video_hash,
+                ))
+                db.commit()
+                return RenderResult(
+                    output_path=last.output_path, subtitles_path=subtitles_path, dropped_transitions=dropped
+                )
+        mp4_paths = _scene_segments(project_dir, build_pieces(pieces, project_dir / "_pieces", profile))
+
     final_mp4 = out_dir / "final_render.mp4"
     _concat_videos_ffmpeg(mp4_paths, str(final_mp4))
+    output_path = str(final_mp4)
 
-    narration = out_dir / "narration.wav"
     if narration.exists():
         final_with_audio = out_dir / "final_render_with_audio.mp4"
         _mux_audio_ffmpeg(str(final_mp4), str(narration), str(final_with_audio))
-        return RenderResult(output_path=str(final_with_audio))
+        output_path = str(final_with_audio)
+
+    # freshly joined: no track to replace, only a stale sidecar to remove
+    subtitles_path = _subtitles(Path(output_path), cues, replace=False)
 
-    return RenderResult(output_path=str(final_mp4))
+    if not draft:
+        db.add(Render(project_id=project_id, output_path=output_path, input_hash=input_hash, video_hash=video_hash))
+        db.commit()
+    return RenderResult(output_path=output_path, subtitles_path=subtitles_path, dropped_transitions=dropped)
@@ -8,22 +8,56 @@ from fastapi.responses import FileResponse
 from sqlalchemy import select
 from sqlalchemy.orm import Session
 
-from ..animations import default_animation_plan
+from ..animation.profiles import delivery_profile
+from ..animations import caption_mode, default_animation_plan, parse_plan
 from ..audio import synthesize_narration
 from ..config import settings
 from ..db import get_db
-from ..models import Chapter, Project, Scene, Shot
+from ..models import Chapter, Project, Scene, Shot, ShotStatus
 from ..planner import simple_plan
 from ..renderer import render_project
+from ..storage import preview_project_dir
 from ..schemas import ChapterUpload, PlanRequest, ProjectCreate, ProjectOut, SceneOut
-from ..tasks import celery_app, generate_shot
+from ..tasks import celery_app, generate_shot, render_preview
 
 router = APIRouter(prefix="/projects", tags=["projects"])
 
 
+def _profile_name(profile: str | None) -> str | None:
+    """Validated encoding profile name for final shots (None stays None)."""
+    if not profile:
+        return None
+    try:
+        return delivery_profile(profile).name
+    except ValueError as e:
+        raise HTTPException(400, str(e))
+
+
+def _caption_mode_name(mode: str | None) -> str | None:
+    """Validated caption mode (None stays None)."""
+    if not mode:
+        return None
+    try:
+        return caption_mode(mode)
+    except ValueError as e:
+        raise HTTPException(400, str(e))
+
+
+def _worker_alive() -> bool:
+    """True if a Celery worker answers a ping."""
+    try:
+        return bool(celery_app.control.ping(timeout=1.0))
+    except Exception:
+        return False
+
+
 @router.post("", response_model=ProjectOut)
 def create_project(payload: ProjectCreate, db: Session = Depends(get_db)):
-    p = Project(title=payload.title)
+    p = Project(
+        title=payload.title,
+        encoding_profile=_profile_name(payload.encoding_profile),
+        caption_mode=_caption_mode_name(payload.caption_mode),
+    )
     db.add(p)
     db.commit()
     db.refresh(p)
@@ -99,13 +133,17 @@ def get_scenes(project_id: int, db: Session = Depends(get_db)):
 
 
 @router.post("/{project_id}/generate")
-def generate_project(project_id: int, db: Session = Depends(get_db)):
+def generate_project(project_id: int, profile: str | None = None, db: Session = Depends(get_db)):
     """Enqueue all shots for generation.
 
     Dev-friendly behavior:
     - If a Celery worker is alive, enqueue.
     - If no worker responds, run inline (so UI never gets stuck at 0%).
+
+    `profile` (standard | archival) overrides the project's encoding
+    profile for this request; drafts go through /preview.
     """
+    profile = _profile_name(profile)
     p = db.get(Project, project_id)
     if not p:
         raise HTTPException(404, "Project not found")
@@ -119,31 +157,88 @@ def generate_project(project_id: int, db: Session = Depends(get_db)):
     if not shots:
         raise HTTPException(400, "No shots found. Run /plan first")
 
-    # ✅ Detect if a worker is actually alive
-    worker_alive = False
-    try:
-        replies = celery_app.control.ping(timeout=1.0)
-        worker_alive = bool(replies)
-    except Exception:
-        worker_alive = False
-
+    worker_alive = _worker_alive()
     enqueued = 0
     ran_inline = 0
 
     for sh in shots:
         if worker_alive:
             try:
-                celery_app.send_task("generate_shot", args=[sh.id])
+                celery_app.send_task("generate_shot", args=[sh.id], kwargs={"profile": profile})
                 enqueued += 1
                 continue
             except Exception:
                 # if enqueue fails mid-way, fall back inline
                 pass
 
-        generate_shot(sh.id)
+        generate_shot(sh.id, profile=profile)
         ran_inline += 1
 
-    return {"ok": True, "worker_alive": worker_alive, "enqueued_shots": enqueued, "ran_inline": ran_inline}
+    return {
+        "ok": True,
+        "worker_alive": worker_alive,
+        "enqueued_shots": enqueued,
+        "ran_inline": ran_inline,
+        "encoding_profile": profile or p.encoding_profile or settings.encoding_profile,
+    }
+
+
+@router.put("/{project_id}/encoding_profile", response_model=ProjectOut)
+def set_encoding_profile(project_id: int, profile: str | None = None, db: Session = Depends(get_db)):
+    """Set the project's encoding profile (empty resets it to the server default)."""
+    p = db.get(Project, project_id)
+    if not p:
+        raise HTTPException(404, "Project not found")
+    p.encoding_profile = _profile_name(profile)
+    db.commit()
+    db.refresh(p)
+    return p
+
+
+@router.put("/{project_id}/caption_mode", response_model=ProjectOut)
+def set_caption_mode(project_id: int, mode: str | None = None, db: Session = Depends(get_db)):
+    """
+    Set the project's caption mode, burn | soft (empty resets it to the
+    server default). Shots rendered in the other mode go back to PENDING to
+    be re-generated (/generate) with or without burned captions; until then
+    render_project captions each shot by the mode it was rendered with.
+    """
+    p = db.get(Project, project_id)
+    if not p:
+        raise HTTPException(404, "Project not found")
+    p.caption_mode = _caption_mode_name(mode)
+    new_mode = caption_mode(p.caption_mode)
+    shots = db.execute(
+        select(Shot).join(Scene, Shot.scene_id == Scene.id).where(Scene.project_id == project_id)
+    ).scalars().all()
+    for sh in shots:
+        if sh.caption_mode and sh.caption_mode != new_mode:
+            sh.status = ShotStatus.PENDING
+    db.commit()
+    db.refresh(p)
+    return p
+
+
+@router.put("/{project_id}/shots/{shot_id}/caption")
+def set_shot_caption(project_id: int, shot_id: int, caption: str = "", db: Session = Depends(get_db)):
+    """
+    Change a shot's caption. For a shot rendered in soft caption mode the
+    next render only rebuilds the subtitle track; burned captions need the
+    shot re-generated.
+    """
+    sh = db.get(Shot, shot_id)
+    if not sh or not sh.scene or sh.scene.project_id != project_id:
+        raise HTTPException(404, "Shot not found")
+    plan = parse_plan(sh.animation_json) or default_animation_plan(sh.prompt or "", sh.duration_s or 6)
+    plan["caption"] = caption
+    sh.animation_json = json.dumps(plan)
+    db.commit()
+    return {
+        "ok": True,
+        "shot_id": shot_id,
+        "caption": caption,
+        "regenerate": (sh.caption_mode or caption_mode(sh.scene.project.caption_mode)) == "burn",
+    }
 
 
 @router.get("/{project_id}/status")
@@ -187,11 +282,68 @@ def create_audio(project_id: int, voice: str | None = None, rate: int = 175, db:
 def render_endpoint(project_id: int, db: Session = Depends(get_db)):
     try:
         render = render_project(project_id, db)
-        return {"ok": True, "output_path": render.output_path}
+        return {
+            "ok": True,
+            "output_path": render.output_path,
+            "reused": render.reused,
+            "subtitles_path": render.subtitles_path,
+            "dropped_transitions": render.dropped_transitions,
+        }
     except ValueError as e:
         raise HTTPException(400, str(e))
 
 
+@router.post("/{project_id}/preview")
+def preview_endpoint(project_id: int, db: Session = Depends(get_db)):
+    """Draft-render every shot and join them into a preview.
+
+    Like /generate: enqueued if a Celery worker is alive, run inline
+    otherwise. GET /preview serves the latest finished preview.
+    Previews live in their own tree: shot status, shot assets and the final
+    render are never touched.
+    """
+    p = db.get(Project, project_id)
+    if not p:
+        raise HTTPException(404, "Project not found")
+
+    shots = db.execute(
+        select(Shot).join(Scene, Shot.scene_id == Scene.id).where(Scene.project_id == project_id)
+    ).scalars().all()
+    if not shots:
+        raise HTTPException(400, "No shots found. Run /plan first")
+
+    worker_alive = _worker_alive()
+    if worker_alive:
+        try:
+            celery_app.send_task("render_preview", args=[project_id])
+            return {"ok": True, "worker_alive": True, "enqueued": True}
+        except Exception:
+            # enqueue failed: fall back inline
+            pass
+
+    result = render_preview(project_id)
+    if not result.get("ok"):
+        raise HTTPException(400, result.get("error"))
+    return {**result, "worker_alive": worker_alive, "enqueued": False}
+
+
+@router.get("/{project_id}/preview")
+def get_project_preview(project_id: int):
+    out_dir = preview_project_dir(project_id)
+
+    mp4_audio = out_dir / "final_render_with_audio.mp4"
+    mp4_plain = out_dir / "final_render.mp4"
+
+    if mp4_audio.exists():
+        p = mp4_audio
+    elif mp4_plain.exists():
+        p = mp4_plain
+    else:
+        raise HTTPException(status_code=404, detail=f"No preview found in {out_dir}")
+
+    return FileResponse(str(p), media_type="video/mp4", content_disposition_type="inline")
+
+
 @router.get("/{project_id}/video")
 def get_project_video(project_id: int, download: bool = False):
     out_dir = Path(settings.assets_dir) / f"project_{project_id}"
@@ -209,3 +361,13 @@ def get_project_video(project_id: int, download: bool = False):
     if download:
         return FileResponse(str(p), media_type="video/mp4", filename=f"project_{project_id}.mp4")
     return FileResponse(str(p), media_type="video/mp4", content_disposition_type="inline")
+
+
+@router.get("/{project_id}/subtitles")
+def get_project_subtitles(project_id: int, draft: bool = False):
+    """Sidecar WebVTT of the latest render (or preview) in soft caption mode."""
+    out_dir = preview_project_dir(project_id) if draft else Path(settings.assets_dir) / f"project_{project_id}"
+    vtt = out_dir / "final_render.vtt"
+    if not vtt.exists():
+        raise HTTPException(status_code=404, detail=f"No subtitles found in {out_dir}")
+    return FileResponse(str(vtt), media_type="text/vtt", content_disposition_type="inline")
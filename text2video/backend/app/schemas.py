@@ -4,11 +4,15 @@ from typing import Optional, List
 
 class ProjectCreate(BaseModel):
     title: str
+    encoding_profile: Optional[str] = None  # standard | archival
+    caption_mode: Optional[str] = None  # burn | soft
 
 
 class ProjectOut(BaseModel):
     id: int
     title: str
+    encoding_profile: Optional[str] = None
+    caption_mode: Optional[str] = None
 
     class Config:
         from_attributes = True
@@ -38,6 +42,10 @@ class ShotOut(BaseModel):
     shot_type: str
     status: str
     asset_path: Optional[str] = None
+    asset_duration_s: Optional[float] = None
+    asset_width: Optional[int] = None
+    asset_height: Optional[int] = None
+    asset_codec: Optional[str] = None
 
     class Config:
         from_attributes = True
@@ -1,6 +1,7 @@
 import os
 from pathlib import Path
 from .config import settings
+from .animation.clip_cache import ClipCache
 
 PROJECT_ROOT = Path(__file__).resolve().parents[2]  # .../text2video
 
@@ -22,3 +23,47 @@ def shot_video_path(project_id: int, scene_idx: int, shot_idx: int) -> str:
     p = assets_root() / f"project_{project_id}" / f"scene_{scene_idx}"
     p.mkdir(parents=True, exist_ok=True)
     return str(p / f"shot_{shot_idx}.mp4")
+
+def preview_project_dir(project_id: int) -> Path:
+    """Draft previews live in their own tree, never next to final assets."""
+    p = assets_root() / "_preview" / f"project_{project_id}"
+    p.mkdir(parents=True, exist_ok=True)
+    return p
+
+def preview_shot_path(project_id: int, scene_idx: int, shot_idx: int) -> str:
+    p = preview_project_dir(project_id) / f"scene_{scene_idx}"
+    p.mkdir(parents=True, exist_ok=True)
+    return str(p / f"shot_{shot_idx}.mp4")
+
+def caption_cache_dir() -> Path:
+    p = assets_root() / "_cache" / "captions"
+    p.mkdir(parents=True, exist_ok=True)
+    return p
+
+def render_cache_dir() -> Path:
+    p = assets_root() / "_cache" / "renders"
+    p.mkdir(parents=True, exist_ok=True)
+    return p
+
+_render_cache: ClipCache | None = None
+
+def render_cache() -> ClipCache:
+    """Process-wide cache of rendered clips (hit/miss counters live here)."""
+    global _render_cache
+    if _render_cache is None:
+        _render_cache = ClipCache(render_cache_dir(), settings.render_cache_max_mb * 1024 * 1024)
+    return _render_cache
+
+def draft_cache_dir() -> Path:
+    p = assets_root() / "_cache" / "drafts"
+    p.mkdir(parents=True, exist_ok=True)
+    return p
+
+_draft_cache: ClipCache | None = None
+
+def draft_cache() -> ClipCache:
+    """Like render_cache(), for draft previews: separate store and budget."""
+    global _draft_cache
+    if _draft_cache is None:
+        _draft_cache = ClipCache(draft_cache_dir(), settings.draft_cache_max_mb * 1024 * 1024)
+    return _draft_cache
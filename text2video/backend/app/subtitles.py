@@ -0,0 +1,76 @@
+from __future__ import annotations
+
+import os
+import subprocess
+from dataclasses import dataclass
+from pathlib import Path
+from typing import List, Sequence, Tuple
+
+from .config import settings
+
+
+@dataclass(frozen=True)
+class Cue:
+    start: float
+    end: float
+    text: str
+
+
+def cues_from_shots(shots: Sequence[Tuple[float, str]], total_s: float) -> List[Cue]:
+    """
+    Cues for shots given as (start offset in the film, caption) in film
+    order: each caption runs until the next shot starts (or the film ends).
+    Shots without a caption get no cue.
+    """
+    cues = []
+    for i, (start, text) in enumerate(shots):
+        end = shots[i + 1][0] if i + 1 < len(shots) else total_s
+        if text and end > start:
+            cues.append(Cue(start, end, text))
+    return cues
+
+
+def _timestamp(seconds: float) -> str:
+    ms = int(round(max(0.0, seconds) * 1000))
+    h, ms = divmod(ms, 3_600_000)
+    m, ms = divmod(ms, 60_000)
+    s, ms = divmod(ms, 1000)
+    return f"{h:02d}:{m:02d}:{s:02d}.{ms:03d}"
+
+
+def to_webvtt(cues: Sequence[Cue]) -> str:
+    lines = ["WEBVTT", ""]
+    for i, cue in enumerate(cues, 1):
+        # a blank line would end the cue early
+        text = "\n".join(line for line in cue.text.splitlines() if line.strip())
+        lines += [str(i), f"{_timestamp(cue.start)} --> {_timestamp(cue.end)}", text, ""]
+    return "\n".join(lines)
+
+
+def write_webvtt(cues: Sequence[Cue], path: Path) -> Path:
+    tmp = path.with_name(f".{path.name}")
+    tmp.write_text(to_webvtt(cues), encoding="utf-8")
+    os.replace(tmp, path)
+    return path
+
+
+def mux_subtitles(mp4: Path, vtt: Path | None) -> None:
+    """
+    Replace the subtitle track of `mp4` in place with `vtt` as mov_text (or
+    drop it if `vtt` is None). Audio and video are stream-copied, so a caption
+    edit costs a remux, never an encode.
+    """
+    tmp = mp4.with_name(f".{mp4.name}")
+    cmd = ["ffmpeg", "-y", "-i", str(mp4)]
+    if vtt is not None:
+        cmd += ["-i", str(vtt)]
+    cmd += ["-map", "0:v", "-map", "0:a?"]
+    if vtt is not None:
+        cmd += [
+            "-map", "1:s",
+            "-c:s", "mov_text",
+            "-metadata:s:s:0", f"language={settings.subtitle_language}",
+        ]
+    cmd += ["-c:v", "copy", "-c:a", "copy", "-movflags", "+faststart", str(tmp)]
+    subprocess.run(cmd, check=True, capture_output=True, text=True)
+    os.replace(tmp, mp4)
@@ -3,25 +3,37 @@ from __future__ import annotations
 import json
 import os
 import subprocess
+from dataclasses import asdict
 from pathlib import Path
 
 from celery import Celery
+from sqlalchemy import select
 from sqlalchemy.orm import Session
 
 from .config import settings
 from .db import SessionLocal
-from .models import Shot, ShotStatus
-from .storage import shot_video_path
+from .models import Scene, Shot, ShotStatus
+from .probe import ClipInfo, clip_info_from_dict, conform_clip, probe_clip, store_clip_info
+from .renderer import render_project
+from .transitions import transition_from_plan
+from .storage import draft_cache, preview_shot_path, render_cache, shot_video_path
 from .animations import (
     apply_animations_ffmpeg,
+    caption_lines,
+    caption_mode,
     default_animation_plan,
     parse_plan,
 )
 from .providers.wan2_client import wan_generate_mp4
 
 # ✅ NEW: scene-spec compiler/encoder (drives visuals from text)
+from app.animation.clip_cache import clip_key
 from app.animation.scene_compiler import text_to_scene_spec
-from app.animation.scene_encode import render_scene_to_mp4
+from app.animation.pipeline import draft_settings
+from app.animation.motion import scene_motion
+from app.animation.profiles import DELIVERY, EncodingProfile, adapt_profile, cap_keyint, delivery_profile, get_profile, shot_budget
+from app.animation.scene_encode import render_scene_cached, render_scene_to_mp4, subsampled_fps
+from app.animation.shot_fx import shot_fx_from_plan
 
 
 celery_app = Celery(
@@ -31,7 +43,7 @@ celery_app = Celery(
 )
 
 
-def _make_test_pattern(out_mp4: str, duration_s: int = 6):
+def _make_test_pattern(out_mp4: str, duration_s: int = 6, profile: EncodingProfile | None = None):
     """
     Very fast dummy video used for debugging.
     Deterministic: smptebars.
@@ -44,19 +56,142 @@ def _make_test_pattern(out_mp4: str, duration_s: int = 6):
         "-f",
         "lavfi",
         "-i",
-        "smptebars=size=1280x720:rate=24",
+        f"smptebars=size={DELIVERY.width}x{DELIVERY.height}:rate={DELIVERY.fps}",
         "-t",
         str(max(1, int(duration_s))),
-        "-pix_fmt",
-        "yuv420p",
+        *get_profile(profile).x264_args(DELIVERY.fps, tune="stillimage"),
         out_mp4,
     ]
     subprocess.run(cmd, check=True, capture_output=True, text=True)
 
 
-def _make_animation_base_clip(shot: Shot, scene, dur: int, out_mp4: str) -> str:
+def _deliver(
+    shot: Shot, clip: str, out_mp4: str, profile: EncodingProfile, info: ClipInfo | None = None
+) -> tuple[str, ClipInfo]:
+    """
+    Enforce the output contract (profiles.DELIVERY) on a finished shot clip
+    and record its probed metadata on the shot (`info` if already known,
+    e.g. from the render cache). A clip that breaks it, e.g. a salvaged raw
+    WAN2 clip, is re-encoded into `out_mp4` here, once, so render_project
+    can always join shots by stream copy.
+    """
+    info = info or probe_clip(clip)
+    problems = info.mismatches()
+    if problems:
+        tmp = str(Path(out_mp4).with_suffix(".conform.mp4"))
+        conform_clip(clip, tmp, profile)
+        os.replace(tmp, out_mp4)
+        clip = out_mp4
+        info = probe_clip(clip)
+        shot.error = " ".join(filter(None, [shot.error, f"Conformed to delivery format ({'; '.join(problems)})."]))
+    store_clip_info(shot, info)
+    return clip, info
+
+
+def _pixel_plan(plan: dict, shot: Shot) -> dict:
+    """
+    The plan as the renderers see it: in a "soft" caption mode project the
+    caption goes to render_project's subtitle track, not into the pixels,
+    so caption edits never require re-encoding the shot.
+    """
+    project = shot.scene.project if shot.scene else None
+    soft = caption_mode(getattr(project, "caption_mode", None)) == "soft"
+    if soft and plan.get("text") not in (False, "off", "none"):
+        return {**plan, "text": "soft"}
+    return plan
+
+
+def _asset_caption_mode(plan: dict, overlaid: bool = True) -> str:
+    """
+    Caption mode of a generated asset (Shot.caption_mode): "soft" when the
+    plan keeps the caption out of the pixels or no caption pass ran
+    (salvaged raw clips), so render_project puts it on the subtitle track.
+    """
+    return "burn" if overlaid and plan.get("text") != "soft" else "soft"
+
+
+def _cut_keyint(plan: dict, dur: float) -> float | None:
+    """
+    Longest keyframe interval that still gives a shot a stream-copy cut
+    point past its incoming transition and before its outgoing one, so
+    render_project can smart-render both (see transitions.plan_pieces).
+    Costs at most one extra keyframe per shot. None if the shot is joined
+    by plain cuts (its plan's transition in, and settings.transition for
+    the next shot's), which need no cut points, or is too short for two
+    transitions anyway.
+    """
+    try:
+        into = transition_from_plan(plan, settings.transition, settings.transition_seconds)
+    except ValueError:
+        # render_project reports the unknown kind
+        into = None
+    default = transition_from_plan({}, settings.transition, settings.transition_seconds)
+    lengths = [t.seconds for t in (into, default) if t is not None]
+    if not lengths:
+        return None
+    cap = float(dur) - 2 * max(lengths)
+    return cap if cap > 0 else None
+
+
+def _shot_profile(requested, shot: Shot) -> EncodingProfile:
+    """
+    Encoding profile for a final shot: the request's, else the project's,
+    else the default. The draft tier is rejected (see delivery_profile).
+    """
+    project = shot.scene.project if shot.scene else None
+    return delivery_profile(requested or getattr(project, "encoding_profile", None) or settings.encoding_profile)
+
+
+def _scene_render_fps(
+    requested,
+    spec,
+    fps: int,
+    dur: int,
+    w: int = 1280,
+    h: int = 720,
+    max_step_px: float | None = None,
+) -> int:
+    """
+    Internal render rate for a shot's scene. The shot's animation plan may ask
+    for "render_fps": "auto" (chosen from the scene's motion) or a number.
+    Without one, every delivered frame is rendered unless the shot type's
+    budget sets a `max_step_px` to subsample with (BRIDGE shots only).
+    """
+    if requested is None and max_step_px is not None:
+        return subsampled_fps(spec, fps, w, h, float(dur), max_step_px=max_step_px)
+    if requested == "auto":
+        return subsampled_fps(spec, fps, w, h, float(dur))
+    try:
+        return max(1, min(fps, int(requested)))
+    except (TypeError, ValueError):
+        return fps
+
+
+def _make_animation_base_clip(
+    shot: Shot,
+    scene,
+    dur: int,
+    out_mp4: str,
+    plan=None,
+    draft: bool = False,
+    profile: EncodingProfile | None = None,
+) -> tuple[str, dict]:
     """
     Core generator used by UI fallback: procedural cartoon scene based on text.
+    With an animation plan, its camera move and lower-third caption are
+    applied while each frame is composited, so the shot is encoded once
+    (a long shot still renders its looping scene only once per period, see
+    render_scene_to_mp4). Shots without either are cut from a cached scene
+    master (see render_scene_cached). Drafts use their own cache
+    (storage.draft_cache).
+    `draft` renders a reduced-size, reduced-rate preview with the "draft"
+    encoding profile. Otherwise `profile` (default profile if None) is
+    adapted to the shot: its measured motion and its shot type's budget pick
+    CRF, tune, keyframe spacing and the internal render rate.
+    Whole shots are cached too (render cache hits take a hardlink, see
+    ClipCache.lookup).
+    Returns (mp4 path, result info: render fps, cache, motion, x264
+    settings, and "asset": the probed clip as a dict).
     """
     Path(out_mp4).parent.mkdir(parents=True, exist_ok=True)
 
@@ -71,19 +206,100 @@ def _make_animation_base_clip(shot: Shot, scene, dur: int, out_mp4: str) -> str:
         anim_text = f"Scene {scene.idx} shot {shot.idx}"
 
     spec = text_to_scene_spec(anim_text)
-    final_mp4 = render_scene_to_mp4(
-        spec,
-        out_mp4,
-        seconds=float(dur),
-        fps=30,
-        w=1280,
-        h=720,
+    w, h, out_fps = DELIVERY.width, DELIVERY.height, DELIVERY.fps
+    if draft:
+        w, h, out_fps = draft_settings(w, h, out_fps)
+    plan = plan or {}
+    fx = None
+    if plan:
+        title, sub = caption_lines(plan, getattr(shot, "prompt", None) or "")
+        fx = shot_fx_from_plan(plan, float(dur), title, sub, scale=h / 720)
+    budget = shot_budget(getattr(shot, "shot_type", None))
+    fps = _scene_render_fps(
+        plan.get("render_fps"), spec, out_fps, dur, w=w, h=h, max_step_px=budget.max_step_px
+    )
+    cache = draft_cache() if draft else render_cache()
+    profile = get_profile("draft" if draft else profile)
+    cut_keyint = None if draft else _cut_keyint(plan, dur)
+
+    # Whole-shot entry. The profile is keyed before adaptation: the adapted
+    # one follows from it, the budget, the cut interval and the motion (which
+    # follows from the scene and camera), so a hit measures nothing. Its
+    # metadata has the result info and the probed clip, so callers skip
+    # probing it too.
+    key = clip_key(
+        "shot", spec, seconds=float(dur), fps=out_fps, w=w, h=h, render_fps=fps,
+        fx=fx, profile=profile, budget=budget, max_keyint_seconds=cut_keyint,
     )
-    return final_mp4
+    cached = cache.lookup(key, out_mp4)
+    if cached is not None:
+        return out_mp4, {**cached, "render_cache": "hit", "render_cache_counts": cache.counts()}
+
+    motion = None
+    if not draft:
+        motion = scene_motion(spec, float(dur), out_fps, w, h, fx=fx)
+        profile = adapt_profile(profile, motion, getattr(shot, "shot_type", None), cut_keyint)
+    # `out_mp4` may be a hardlink into the cache from an earlier hit.
+    Path(out_mp4).unlink(missing_ok=True)
+    if fx is None:
+        final_mp4, scene_hit = render_scene_cached(
+            cache,
+            spec,
+            out_mp4,
+            seconds=float(dur),
+            fps=out_fps,
+            w=w,
+            h=h,
+            render_fps=fps,
+            profile=profile,
+        )
+    else:
+        final_mp4 = render_scene_to_mp4(
+            spec, out_mp4, seconds=float(dur), fps=out_fps, w=w, h=h, render_fps=fps, fx=fx, profile=profile
+        )
+        scene_hit = False
+    info = {
+        "render_fps": fps,
+        "encoder": {"crf": profile.crf, "tune": profile.tune, "keyint_seconds": profile.keyint_seconds},
+    }
+    if motion is not None:
+        info["motion"] = motion.as_dict()
+    info["asset"] = asdict(probe_clip(final_mp4))
+    cache.put(key, final_mp4, meta=info)
+    return final_mp4, {
+        **info,
+        # "scene": the shot was cut from a cached scene master
+        "render_cache": "scene" if scene_hit else "miss",
+        "render_cache_counts": cache.counts(),
+    }
+
+
+def _generate_shot_draft(shot: Shot, scene, dur: int) -> dict:
+    """
+    Draft preview of a shot, written to the preview tree. Always the
+    procedural renderer (no WAN2 call). Never touches the shot's status,
+    error or asset_path, nor its final mp4.
+    """
+    plan = parse_plan(getattr(shot, "animation_json", None)) or default_animation_plan(shot.prompt or "", dur)
+    plan = _pixel_plan(plan, shot)
+    out_mp4 = preview_shot_path(scene.project_id, scene.idx, shot.idx)
+    try:
+        preview_path, info = _make_animation_base_clip(shot, scene, dur, out_mp4, plan=plan, draft=True)
+    except Exception as e:
+        return {"ok": False, "shot_id": shot.id, "draft": True, "error": str(e)}
+    return {
+        "ok": True,
+        "shot_id": shot.id,
+        "draft": True,
+        "preview_path": str(Path(preview_path).resolve()),
+        "provider": "TEXT_ANIMATION",
+        "encoding_profile": "draft",
+        **info,
+    }
 
 
 @celery_app.task(name="generate_shot")
-def generate_shot(shot_id: int):
+def generate_shot(shot_id: int, draft: bool = False, profile: str | None = None):
     db: Session = SessionLocal()
     shot = None
 
@@ -92,9 +308,17 @@ def generate_shot(shot_id: int):
         if not shot:
             return {"ok": False, "error": "Shot not found"}
 
+        # Draft preview: separate artifact, shot state left alone
+        if draft:
+            if not shot.scene:
+                return {"ok": False, "error": "Scene not found"}
+            return _generate_shot_draft(shot, shot.scene, max(1, int(shot.duration_s or 6)))
+
         # Mark as running
         shot.status = ShotStatus.RUNNING
         shot.error = None
+        store_clip_info(shot, None)
+        shot.caption_mode = None
         db.commit()
 
         scene = shot.scene
@@ -105,6 +329,7 @@ def generate_shot(shot_id: int):
             return {"ok": False, "error": "Scene not found"}
 
         project_id = scene.project_id
+        enc = _shot_profile(profile, shot)
 
         # Keep duration sane
         dur = max(1, int(shot.duration_s or 6))
@@ -114,6 +339,26 @@ def generate_shot(shot_id: int):
         base_mp4 = out_mp4.replace(".mp4", "_base.mp4")
 
         Path(out_mp4).parent.mkdir(parents=True, exist_ok=True)
+        # A cache hit hands out a hardlink to the cache entry; never let the
+        # ffmpeg passes below write through it.
+        Path(out_mp4).unlink(missing_ok=True)
+
+        # --------------------------------------------------
+        # Load or create the animation plan
+        # (camera motion, caption, per-shot settings like "render_fps")
+        # --------------------------------------------------
+        plan = parse_plan(getattr(shot, "animation_json", None))
+
+        if not plan:
+            plan = default_animation_plan(shot.prompt or "", dur)
+            try:
+                shot.animation_json = json.dumps(plan)
+                db.commit()
+            except Exception:
+                pass
+        plan = _pixel_plan(plan, shot)
+        cut_keyint = _cut_keyint(plan, dur)
+        enc = cap_keyint(enc, cut_keyint)
 
         # --------------------------------------------------
         # 0️⃣ Provider selection
@@ -133,25 +378,47 @@ def generate_shot(shot_id: int):
             try:
                 wan_generate_mp4(
                     prompt=prompt,
-                    out_path=out_mp4,
+                    out_path=base_mp4,
                     width=1280,
                     height=704,
                 )
                 
-                if not Path(out_mp4).exists():
+                if not Path(base_mp4).exists():
                     shot.status = ShotStatus.FAILED
                     shot.error = "WAN2 did not produce an mp4"
                     db.commit()
                     return {"ok": False, "error": shot.error}
 
-                shot.asset_path = str(Path(out_mp4).resolve())
+                # Externally produced clip: camera move + lower-third in one ffmpeg pass
+                try:
+                    apply_animations_ffmpeg(
+                        base_mp4,
+                        out_mp4,
+                        dur,
+                        plan,
+                        prompt_for_text=shot.prompt or "",
+                        # no motion measurement for external footage: budget only
+                        profile=adapt_profile(enc, shot_type=shot.shot_type, max_keyint_seconds=cut_keyint),
+                        tune="film",
+                    )
+                    wan_final, provider_name = out_mp4, "WAN2+FFMPEG"
+                except Exception as e:
+                    # Salvage mode — still succeed with the raw WAN2 clip
+                    shot.error = f"FFMPEG animation overlay failed; used raw WAN2 clip. {e}"
+                    wan_final, provider_name = base_mp4, "WAN2"
+
+                wan_final, clip = _deliver(shot, wan_final, out_mp4, enc)
+                shot.asset_path = str(Path(wan_final).resolve())
+                shot.caption_mode = _asset_caption_mode(plan, overlaid=provider_name != "WAN2")
                 shot.status = ShotStatus.SUCCEEDED
                 db.commit()
                 return {
                     "ok": True,
                     "shot_id": shot_id,
                     "asset_path": shot.asset_path,
-                    "provider": "WAN2",
+                    "provider": provider_name,
+                    "encoding_profile": enc.name,
+                    "asset": asdict(clip),
                 }
             except Exception as e:
                 # If WAN2 fails (e.g. no colab URL configured), fall back to procedural text animation.
@@ -159,61 +426,49 @@ def generate_shot(shot_id: int):
                 # Exception caught. Execution will continue to the text-animation fallback.
 
         # --------------------------------------------------
-        # 2️⃣ CORE FALLBACK BASE CLIP = TEXT ANIMATION
+        # 2️⃣ CORE FALLBACK = TEXT ANIMATION, SINGLE PASS
         # (This replaces smptebars as the default generator.)
+        # Camera motion + lower-third are applied while compositing each
+        # frame (see render_scene_to_mp4), so the shot is encoded exactly
+        # once; a repeat of it is a render cache hit and not encoded at all.
         # --------------------------------------------------
+        asset = None
         try:
             # ✅ Step-2 requirement: fallback calls _make_animation_base_clip(...)
-            base_final = _make_animation_base_clip(shot, scene, dur, base_mp4)
+            final_path, info = _make_animation_base_clip(
+                shot, scene, dur, out_mp4, plan=plan, profile=enc
+            )
+            asset = clip_info_from_dict(info.pop("asset"))
+            provider_name = "TEXT_ANIMATION"
         except Exception as e:
             # Emergency fallback (only if animation renderer fails)
-            _make_test_pattern(base_mp4, duration_s=dur)
+            _make_test_pattern(base_mp4, duration_s=dur, profile=enc)
             shot.error = f"Animation base generation failed; used test pattern. {e}"
-            base_final = base_mp4
-
-        # base_final should exist
-        if not Path(base_final).exists():
-            shot.status = ShotStatus.FAILED
-            shot.error = "Base mp4 not found after fallback generation"
-            db.commit()
-            return {"ok": False, "error": shot.error}
-
-        # --------------------------------------------------
-        # 3️⃣ Load or create ffmpeg animation plan (optional)
-        # If you still want your ffmpeg filter animations on top, keep this.
-        # Otherwise you can skip straight to success using base_final.
-        # --------------------------------------------------
-        plan = parse_plan(getattr(shot, "animation_json", None))
+            info = {"render_fps": DELIVERY.fps}
 
-        if not plan:
-            plan = default_animation_plan(shot.prompt or "", dur)
+            # --------------------------------------------------
+            # 3️⃣ Externally produced clip: apply ffmpeg animations (second pass)
+            # --------------------------------------------------
             try:
-                shot.animation_json = json.dumps(plan)
-                db.commit()
-            except Exception:
-                pass
-
-        # --------------------------------------------------
-        # 4️⃣ Apply ffmpeg animations -> final mp4 (optional)
-        # --------------------------------------------------
-        try:
-            apply_animations_ffmpeg(
-                base_final,
-                out_mp4,
-                dur,
-                plan,
-                prompt_for_text=shot.prompt or "",
-            )
-            final_path = out_mp4
-            provider_name = "TEXT_ANIMATION_FALLBACK+FFMPEG"
-        except Exception as e:
-            # Salvage mode — still succeed with base animation
-            shot.error = f"FFMPEG animation overlay failed; used base animation. {e}"
-            final_path = base_final
-            provider_name = "TEXT_ANIMATION_FALLBACK"
+                apply_animations_ffmpeg(
+                    base_mp4,
+                    out_mp4,
+                    dur,
+                    plan,
+                    prompt_for_text=shot.prompt or "",
+                    profile=enc,
+                    tune="stillimage",
+                )
+                final_path = out_mp4
+                provider_name = "TEST_PATTERN+FFMPEG"
+            except Exception as e2:
+                # Salvage mode — still succeed with the bare clip
+                shot.error = f"{shot.error} FFMPEG animation overlay failed; used base clip. {e2}"
+                final_path = base_mp4
+                provider_name = "TEST_PATTERN"
 
         # --------------------------------------------------
-        # 5️⃣ Mark success
+        # 4️⃣ Mark success
         # --------------------------------------------------
         if not Path(final_path).exists():
             shot.status = ShotStatus.FAILED
@@ -221,7 +476,9 @@ def generate_shot(shot_id: int):
             db.commit()
             return {"ok": False, "error": shot.error}
 
+        final_path, clip = _deliver(shot, final_path, out_mp4, enc, asset)
         shot.asset_path = str(Path(final_path).resolve())
+        shot.caption_mode = _asset_caption_mode(plan, overlaid=provider_name != "TEST_PATTERN")
         shot.status = ShotStatus.SUCCEEDED
         db.commit()
 
@@ -230,6 +487,9 @@ def generate_shot(shot_id: int):
             "shot_id": shot_id,
             "asset_path": shot.asset_path,
             "provider": provider_name,
+            "encoding_profile": enc.name,
+            "asset": asdict(clip),
+            **info,
         }
 
     except Exception as e:
@@ -241,3 +501,34 @@ def generate_shot(shot_id: int):
 
     finally:
         db.close()
+
+
+@celery_app.task(name="render_preview")
+def render_preview(project_id: int):
+    """
+    Draft-render every shot of a project and join them into its preview
+    (served by GET /projects/{id}/preview). Shot status, shot assets and
+    the final render are never touched.
+    """
+    db: Session = SessionLocal()
+    try:
+        shots = db.execute(
+            select(Shot)
+            .join(Scene, Shot.scene_id == Scene.id)
+            .where(Scene.project_id == project_id)
+            .order_by(Scene.idx.asc(), Shot.idx.asc())
+        ).scalars().all()
+        results = [generate_shot(sh.id, draft=True) for sh in shots]
+        failed = [r for r in results if not r.get("ok")]
+        render = render_project(project_id, db, draft=True)
+        return {
+            "ok": True,
+            "output_path": render.output_path,
+            "subtitles_path": render.subtitles_path,
+            "shots_rendered": len(results) - len(failed),
+            "shots_failed": [{"shot_id": r.get("shot_id"), "error": r.get("error")} for r in failed],
+        }
+    except Exception as e:
+        return {"ok": False, "error": str(e)}
+    finally:
+        db.close()
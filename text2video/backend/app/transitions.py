@@ -0,0 +1,276 @@
+from __future__ import annotations
+
+import os
+import subprocess
+from bisect import bisect_left, bisect_right
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Any, Dict, List, Sequence, Tuple
+
+from .animation.clip_cache import clip_key
+from .animation.profiles import DELIVERY, EncodingProfile, get_profile
+
+# Transition kinds a shot's plan can ask for ("transition": ...)
+TRANSITIONS = ("crossfade", "dip")
+DEFAULT_TRANSITION_S = 0.5
+# Keyframe timestamps are stored rounded to the millisecond
+_EPS = 1e-3
+
+
+@dataclass(frozen=True)
+class Transition:
+    """How a shot is entered from the previous one."""
+
+    kind: str  # "crossfade": shots overlap by `seconds`; "dip": out to black and back, no overlap
+    seconds: float = DEFAULT_TRANSITION_S
+
+
+def transition_from_plan(
+    plan: Dict[str, Any],
+    default: str = "cut",
+    seconds: float = DEFAULT_TRANSITION_S,
+) -> Transition | None:
+    """
+    Transition into a shot from its animation plan
+    ({"transition": "cut"|"crossfade"|"dip", "transition_s": 0.5}); None is a hard cut.
+    """
+    kind = str(plan.get("transition") or default or "cut").strip().lower()
+    if kind in ("cut", "none"):
+        return None
+    if kind not in TRANSITIONS:
+        raise ValueError(f"Unknown transition: {kind} (expected cut, {', '.join(TRANSITIONS)})")
+    length = float(plan.get("transition_s") or seconds)
+    return Transition(kind, length) if length > 0 else None
+
+
+@dataclass(frozen=True)
+class ShotClip:
+    """A shot asset as render_project sees it (metadata from the Shot row)."""
+
+    scene: int
+    path: str
+    sha256: str
+    duration_s: float
+    keyframes: Tuple[float, ...]
+    transition_in: Transition | None = None
+
+
+@dataclass(frozen=True)
+class Piece:
+    """
+    One span of the joined film:
+    - "shot": a whole shot asset ([0, end)), used as is
+    - "copy": [start, end) of a shot, cut on keyframes by stream copy
+    - "boundary": the re-encoded frames around a transition, from `start` in
+      the outgoing shot (`tail_s` seconds to its end) to `end` in the incoming one
+    `shot` is the index of the clip the piece shows (the incoming one for a boundary).
+    """
+
+    shot: int
+    scene: int
+    key: str
+    kind: str
+    sources: Tuple[str, ...]
+    start: float = 0.0
+    end: float = 0.0
+    tail_s: float = 0.0
+    transition: Transition | None = None
+
+
+def _last_keyframe(keyframes: Sequence[float], lo: float, hi: float) -> float | None:
+    """Latest keyframe in [lo, hi], or None."""
+    i = bisect_right(keyframes, hi + _EPS)
+    if i and keyframes[i - 1] >= lo - _EPS:
+        return keyframes[i - 1]
+    return None
+
+
+def _first_keyframe(keyframes: Sequence[float], lo: float, hi: float) -> float | None:
+    """Earliest keyframe in [lo, hi), or None."""
+    i = bisect_left(keyframes, lo - _EPS)
+    if i < len(keyframes) and keyframes[i] < hi - _EPS:
+        return keyframes[i]
+    return None
+
+
+def plan_pieces(clips: Sequence[ShotClip], profile: EncodingProfile) -> List[Piece]:
+    """
+    Split the film into stream-copied shot interiors and re-encoded
+    transition boundaries. A boundary runs from the last keyframe of the
+    outgoing shot that leaves room for the transition to the first keyframe
+    of the incoming shot past it, so only about a GOP on each side of a cut
+    is decoded and encoded. A transition with no keyframe to cut at (shot
+    shorter than the transition, already consumed by its other boundary, or
+    a GOP longer than tasks._cut_keyint allows) is dropped to a hard cut;
+    see dropped_transitions.
+    """
+    n = len(clips)
+    in_cut = [0.0] * n
+    out_cut = [c.duration_s for c in clips]
+    entering: List[Transition | None] = [None] * n
+    for i in range(1, n):
+        t = clips[i].transition_in
+        if t is None:
+            continue
+        a, b = clips[i - 1], clips[i]
+        ka = _last_keyframe(a.keyframes, in_cut[i - 1], a.duration_s - t.seconds)
+        kb = _first_keyframe(b.keyframes, t.seconds, b.duration_s)
+        if ka is None or kb is None:
+            continue
+        out_cut[i - 1], in_cut[i], entering[i] = ka, kb, t
+
+    pieces: List[Piece] = []
+    for i, c in enumerate(clips):
+        t = entering[i]
+        if t is not None:
+            a = clips[i - 1]
+            pieces.append(Piece(
+                shot=i,
+                scene=c.scene,
+                key=clip_key("boundary", [a.sha256, c.sha256], start=out_cut[i - 1], end=in_cut[i],
+                             transition=t, profile=profile),
+                kind="boundary",
+                sources=(a.path, c.path),
+                start=out_cut[i - 1],
+                end=in_cut[i],
+                tail_s=a.duration_s - out_cut[i - 1],
+                transition=t,
+            ))
+        start, end = in_cut[i], out_cut[i]
+        if end - start < _EPS:
+            continue
+        if start == 0.0 and end == c.duration_s:
+            pieces.append(Piece(shot=i, scene=c.scene, key=c.sha256, kind="shot", sources=(c.path,), end=end))
+        else:
+            pieces.append(Piece(
+                shot=i,
+                scene=c.scene,
+                key=clip_key("copy", c.sha256, start=start, end=end),
+                kind="copy",
+                sources=(c.path,),
+                start=start,
+                end=end,
+            ))
+    return pieces
+
+
+def dropped_transitions(clips: Sequence[ShotClip], pieces: Sequence[Piece]) -> List[int]:
+    """Indices of the clips whose transition plan_pieces turned into a hard cut."""
+    entered = {piece.shot for piece in pieces if piece.kind == "boundary"}
+    return [i for i, c in enumerate(clips) if c.transition_in is not None and i not in entered]
+
+
+def piece_seconds(piece: Piece) -> float:
+    """Length of a piece in the joined film."""
+    if piece.kind != "boundary":
+        return piece.end - piece.start
+    overlap = piece.transition.seconds if piece.transition.kind == "crossfade" else 0.0
+    return piece.tail_s + piece.end - overlap
+
+
+def shot_starts(pieces: Sequence[Piece], n: int) -> Tuple[List[float], float]:
+    """
+    Where each of the `n` shots starts in the joined film, and the film's
+    length. A crossfaded shot starts when the fade begins; a dipped one when
+    it comes up from black.
+    """
+    starts: List[float | None] = [None] * n
+    t = 0.0
+    for piece in pieces:
+        if piece.kind == "boundary":
+            # the outgoing shot may have no interior left: it starts in here
+            if starts[piece.shot - 1] is None:
+                starts[piece.shot - 1] = t
+            overlap = piece.transition.seconds if piece.transition.kind == "crossfade" else 0.0
+            starts[piece.shot] = t + piece.tail_s - overlap
+        elif starts[piece.shot] is None:
+            starts[piece.shot] = t
+        t += piece_seconds(piece)
+    return [s or 0.0 for s in starts], t
+
+
+def _run(cmd: list[str]) -> None:
+    subprocess.run(cmd, check=True, capture_output=True, text=True)
+
+
+def copy_span(src: str, out_mp4: str, start: float, end: float) -> str:
+    """[start, end) of a clip by stream copy; both ends must be keyframes."""
+    _run([
+        "ffmpeg", "-y",
+        "-ss", f"{start:.3f}",
+        "-i", src,
+        "-t", f"{end - start:.3f}",
+        "-map", "0:v:0",
+        "-c", "copy",
+        "-avoid_negative_ts", "make_zero",
+        "-video_track_timescale", str(DELIVERY.timescale),
+        "-movflags", "+faststart",
+        out_mp4,
+    ])
+    return out_mp4
+
+
+def render_boundary(piece: Piece, out_mp4: str, profile: EncodingProfile) -> str:
+    """Re-encode the frames around one transition (see Piece)."""
+    t = piece.transition
+    fps = DELIVERY.fps
+    norm = f"settb=AVTB,fps={fps},format=yuv420p"
+    if t.kind == "crossfade":
+        graph = (
+            f"[0:v]{norm}[a];[1:v]{norm}[b];"
+            f"[a][b]xfade=transition=fade:duration={t.seconds:.3f}:offset={piece.tail_s - t.seconds:.3f}[v]"
+        )
+    else:
+        # dip to black: half the length out, half in, shots keep their length
+        half = t.seconds / 2
+        graph = (
+            f"[0:v]{norm},fade=t=out:st={piece.tail_s - half:.3f}:d={half:.3f}[a];"
+            f"[1:v]{norm},fade=t=in:st=0:d={half:.3f}[b];"
+            f"[a][b]concat=n=2:v=1:a=0[v]"
+        )
+    a, b = piece.sources
+    _run([
+        "ffmpeg", "-y",
+        "-ss", f"{piece.start:.3f}", "-i", a,
+        "-t", f"{piece.end:.3f}", "-i", b,
+        "-filter_complex", graph,
+        "-map", "[v]", "-an",
+        *profile.x264_args(fps),
+        out_mp4,
+    ])
+    return out_mp4
+
+
+def build_pieces(
+    pieces: Sequence[Piece],
+    root: Path,
+    profile: str | EncodingProfile | None = None,
+) -> List[Tuple[int, str, str]]:
+    """
+    Materialize pieces as files under `root`, named by key so unchanged
+    boundaries and spans are reused across renders (pieces no longer in use
+    are removed). Returns (scene, path, key) per piece, in film order.
+    """
+    profile = get_profile(profile)
+    root.mkdir(parents=True, exist_ok=True)
+    entries: List[Tuple[int, str, str]] = []
+    keep = set()
+    for piece in pieces:
+        if piece.kind == "shot":
+            entries.append((piece.scene, piece.sources[0], piece.key))
+            continue
+        out = root / f"{piece.kind}.{piece.key[:24]}.mp4"
+        if not out.exists():
+            tmp = out.with_name(f".{out.name}")
+            if piece.kind == "copy":
+                copy_span(piece.sources[0], str(tmp), piece.start, piece.end)
+            else:
+                render_boundary(piece, str(tmp), profile)
+            os.replace(tmp, out)
+        keep.add(out.name)
+        entries.append((piece.scene, str(out), piece.key))
+
+    for p in root.iterdir():
+        if p.name not in keep:
+            p.unlink(missing_ok=True)
+    return entries